@@ -20,6 +20,16 @@ setup(
         "pydantic>=2.5.0",
         "pydantic-settings>=2.1.0",
         "structlog>=23.2.0",
+        "cachetools>=5.3.2",
+        "orjson>=3.9.10",
     ],
+    extras_require={
+        "redis": ["redis>=5.0.1"],
+    },
+    entry_points={
+        "console_scripts": [
+            "rewards-service=src.main:main",
+        ],
+    },
 )
 
@@ -1,19 +1,29 @@
 """FastAPI routes for Rewards service"""
 
-from fastapi import FastAPI, Depends, HTTPException, Request, Header
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Depends, HTTPException, Request, Header, BackgroundTasks, Query
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import select, bindparam
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any, Optional
+from typing import Callable, List, Dict, Any, Optional
 from decimal import Decimal
 from uuid import UUID
+import os
+import logging
+import threading
+from cachetools import TTLCache
 import structlog
 
-from ..db.connection import get_db
+from ..db.connection import get_db, get_session_factory
 from ..auth.jwt_verifier import get_current_user
 from ..ledger.transactions import (
     get_user_balance,
     create_transaction,
-    get_transaction_history,
+    create_debit_transaction,
+    get_transaction_page,
+    encode_cursor,
+    decode_cursor,
 )
 from ..ledger.models import (
     TransactionResponse,
@@ -29,55 +39,107 @@ from ..stripe_integration.connect import (
     create_stripe_account,
     get_stripe_account,
     authorize_transaction,
+    cancel_authorization,
 )
 from ..stripe_integration.webhooks import handle_stripe_webhook
 from ..audit.audit_log import (
     log_transaction,
     log_policy_decision,
-    log_api_request,
+    log_api_request_async,
 )
+from ..audit.queue import audit_writer
 from ..db.models import User
 
-# Configure structured logging
+# Configure structured logging; calls below LOG_LEVEL are no-ops
+LOG_LEVEL = getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO)
+
 structlog.configure(
     processors=[
         structlog.processors.TimeStamper(fmt="iso"),
         structlog.processors.JSONRenderer(),
     ],
+    wrapper_class=structlog.make_filtering_bound_logger(LOG_LEVEL),
 )
 logger = structlog.get_logger()
 
 # Create FastAPI app
+#
+# Routes that touch the database are plain ``def`` so FastAPI runs them in its
+# threadpool; the sync SQLAlchemy session would otherwise block the event loop.
 app = FastAPI(
     title="Rewards Service",
     description="Rewards service for Saint-Daniels project with SNAP-like eligibility",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
 )
 
+# Compress larger bodies such as transaction history pages
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+
+@app.on_event("startup")
+async def start_audit_writer():
+    """Start batching audit log writes"""
+    audit_writer.start()
+
+
+@app.on_event("shutdown")
+async def stop_audit_writer():
+    """Flush pending audit log writes"""
+    await audit_writer.stop()
+
+
+# external_core_id -> user_id; users are never re-keyed once created
+_user_id_cache: TTLCache = TTLCache(maxsize=50_000, ttl=300)
+_user_id_cache_lock = threading.Lock()
+
+# Built once; SQLAlchemy's compiled cache then skips recompiling it per request
+_USER_STMT = select(User).where(User.external_core_id == bindparam("ecid"))
+
 
 def get_user_from_db(db: Session, user_id: UUID) -> User:
-    """Get or create user in database"""
-    user = db.query(User).filter(User.external_core_id == str(user_id)).first()
+    """
+    Get or create user in database.
+    
+    Cache hits return a detached User carrying only user_id and
+    external_core_id, which is all the routes need.
+    """
+    external_core_id = str(user_id)
+    with _user_id_cache_lock:
+        cached_user_id = _user_id_cache.get(external_core_id)
+    if cached_user_id is not None:
+        return User(user_id=cached_user_id, external_core_id=external_core_id)
+    
+    user = db.execute(_USER_STMT, {"ecid": external_core_id}).scalar_one_or_none()
     if not user:
         # Create user if doesn't exist
-        user = User(external_core_id=str(user_id))
+        user = User(external_core_id=external_core_id)
         db.add(user)
         db.commit()
         db.refresh(user)
-        logger.info("user_created", user_id=str(user.user_id), external_core_id=str(user_id))
+        logger.info("user_created", user_id=str(user.user_id), external_core_id=external_core_id)
+    
+    with _user_id_cache_lock:
+        _user_id_cache[external_core_id] = user.user_id
     return user
 
 
+# Health checks are hit constantly by load balancers; serialize the body once
+_HEALTH_BODY = b'{"status":"healthy"}'
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy"}
+    return Response(content=_HEALTH_BODY, media_type="application/json")
 
 
 @app.get("/balance", response_model=BalanceResponse)
-async def get_balance(
+def get_balance(
+    background_tasks: BackgroundTasks,
     current_user: Dict = Depends(get_current_user),
     db: Session = Depends(get_db),
+    session_factory: Callable = Depends(get_session_factory),
     request: Request = None,
 ):
     """
@@ -88,9 +150,10 @@ async def get_balance(
     
     balance = get_user_balance(db, user.user_id)
     
-    # Log API request
-    log_api_request(
-        db,
+    # Log API request after the response is sent
+    background_tasks.add_task(
+        log_api_request_async,
+        session_factory,
         user.user_id,
         "/balance",
         "GET",
@@ -106,41 +169,56 @@ async def get_balance(
 
 
 @app.get("/transactions", response_model=TransactionHistoryResponse)
-async def get_transactions(
-    limit: int = 100,
-    offset: int = 0,
+def get_transactions(
+    background_tasks: BackgroundTasks,
+    limit: int = Query(100, ge=0),
+    offset: int = Query(0, deprecated=True),
+    before: Optional[str] = None,
     current_user: Dict = Depends(get_current_user),
     db: Session = Depends(get_db),
+    session_factory: Callable = Depends(get_session_factory),
     request: Request = None,
 ):
     """
     Get transaction history for authenticated user.
+    
+    Pass the previous response's next_cursor as `before` to page through
+    history without OFFSET scans. `offset` is deprecated and kept only for
+    existing clients.
     """
+    try:
+        cursor = decode_cursor(before) if before else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     user_id = UUID(current_user["user_id"])
     user = get_user_from_db(db, user_id)
     
-    transactions = get_transaction_history(db, user.user_id, limit, offset)
+    transactions, total = get_transaction_page(db, user.user_id, limit, offset, cursor)
     
-    # Log API request
-    log_api_request(
-        db,
+    # Log API request after the response is sent
+    background_tasks.add_task(
+        log_api_request_async,
+        session_factory,
         user.user_id,
         "/transactions",
         "GET",
-        {"limit": limit, "offset": offset},
+        {"limit": limit, "offset": offset, "before": before},
         ip_address=request.client.host if request else None,
     )
     
-    return TransactionHistoryResponse(
-        transactions=[TransactionResponse.model_validate(t) for t in transactions],
-        total=len(transactions),
-        limit=limit,
-        offset=offset,
-    )
+    # ORM rows are validated once, by FastAPI against response_model
+    return {
+        "transactions": transactions,
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "next_cursor": encode_cursor(transactions[-1]) if transactions and len(transactions) == limit else None,
+    }
 
 
 @app.post("/earn", response_model=TransactionResponse)
-async def earn_rewards(
+def earn_rewards(
     transaction: TransactionCreate,
     current_user: Dict = Depends(get_current_user),
     db: Session = Depends(get_db),
@@ -188,11 +266,11 @@ async def earn_rewards(
         ip_address=request.client.host if request else None,
     )
     
-    return TransactionResponse.model_validate(txn)
+    return txn
 
 
 @app.post("/spend", response_model=Dict[str, Any])
-async def spend_rewards(
+def spend_rewards(
     items: List[Dict[str, Any]],
     amount: Decimal,
     merchant_id: Optional[str] = None,
@@ -219,7 +297,7 @@ async def spend_rewards(
     user_id = UUID(current_user["user_id"])
     user = get_user_from_db(db, user_id)
     
-    # Check current balance
+    # Fail fast before calling Stripe; the debit below re-checks atomically
     balance = get_user_balance(db, user.user_id)
     if balance < amount:
         raise HTTPException(
@@ -278,11 +356,11 @@ async def spend_rewards(
             detail="Failed to authorize transaction with Stripe"
         )
     
-    # Create transaction record
-    txn = create_transaction(
+    # Debit the balance and record the transaction in one statement
+    txn = create_debit_transaction(
         db,
         user.user_id,
-        -amount,  # Negative for spend
+        amount,
         "spend",
         stripe_ref=payment_intent_id,
         category="mixed",
@@ -294,6 +372,14 @@ async def spend_rewards(
         },
     )
     
+    if txn is None:
+        # Balance was spent concurrently after the pre-check; release the hold
+        cancel_authorization(payment_intent_id)
+        raise HTTPException(
+            status_code=400,
+            detail=f"Insufficient balance. Required: ${amount}"
+        )
+    
     # Log transaction
     log_transaction(
         db,
@@ -320,7 +406,7 @@ async def spend_rewards(
 
 
 @app.post("/redeem", response_model=TransactionResponse)
-async def redeem_rewards(
+def redeem_rewards(
     transaction: TransactionCreate,
     current_user: Dict = Depends(get_current_user),
     db: Session = Depends(get_db),
@@ -344,25 +430,23 @@ async def redeem_rewards(
     user_id = UUID(current_user["user_id"])
     user = get_user_from_db(db, user_id)
     
-    # Check balance
-    balance = get_user_balance(db, user.user_id)
-    if balance < transaction.amount:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Insufficient balance. Current: ${balance}, Required: ${transaction.amount}"
-        )
-    
-    # Create transaction
-    txn = create_transaction(
+    # Check balance and debit in one statement
+    txn = create_debit_transaction(
         db,
         user.user_id,
-        -transaction.amount,  # Negative for redeem
+        transaction.amount,
         "redeem",
         stripe_ref=transaction.stripe_ref,
         category=transaction.category,
         metadata=transaction.metadata,
     )
     
+    if txn is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Insufficient balance. Required: ${transaction.amount}"
+        )
+    
     # Log transaction
     log_transaction(
         db,
@@ -375,7 +459,7 @@ async def redeem_rewards(
         ip_address=request.client.host if request else None,
     )
     
-    return TransactionResponse.model_validate(txn)
+    return txn
 
 
 @app.post("/webhooks/stripe")
@@ -396,13 +480,16 @@ async def stripe_webhook(
     payload = await request.body()
     
     try:
-        result = handle_stripe_webhook(
+        result = await run_in_threadpool(
+            handle_stripe_webhook,
             db,
             payload,
             stripe_signature,
             ip_address=request.client.host,
         )
         return JSONResponse(content=result)
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
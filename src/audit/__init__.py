@@ -5,12 +5,16 @@ from .audit_log import (
     log_policy_decision,
     log_webhook_event,
     log_api_request,
+    log_api_request_async,
 )
+from .queue import audit_writer
 
 __all__ = [
     "log_transaction",
     "log_policy_decision",
     "log_webhook_event",
     "log_api_request",
+    "log_api_request_async",
+    "audit_writer",
 ]
 
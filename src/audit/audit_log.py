@@ -1,20 +1,63 @@
 """Immutable audit logging system"""
 
+import asyncio
 import hashlib
-import json
-from typing import Optional, Dict, Any
+import uuid
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, ContextManager, Dict, Optional
 from uuid import UUID
 from sqlalchemy.orm import Session
 import structlog
 
 from ..db.models import AuditLog
+from ..db.connection import db_session
+from .queue import audit_writer
 
 logger = structlog.get_logger()
 
 
+# Sized like the API's user-ID cache so every active user's hash stays resident
+USER_HASH_CACHE_SIZE = 50_000
+
+
+@lru_cache(maxsize=USER_HASH_CACHE_SIZE)
+def _hash_user_id_str(user_id: str) -> str:
+    """BLAKE2b-128 hex digest of a user ID string (pure, so memoized)"""
+    return hashlib.blake2b(user_id.encode(), digest_size=16).hexdigest()
+
+
 def _hash_user_id(user_id: UUID) -> str:
-    """Hash user ID for privacy (SHA-256)"""
-    return hashlib.sha256(str(user_id).encode()).hexdigest()
+    """
+    Hash user ID for privacy (BLAKE2b, 128-bit digest).
+    
+    Memoized since one request logs several entries for the same user.
+    Entries written before the switch from SHA-256 carry 64-char hashes.
+    """
+    return _hash_user_id_str(str(user_id))
+
+
+def _write_entry(db: Optional[Session], **values: Any) -> AuditLog:
+    """
+    Record an audit entry.
+    
+    The row is handed to the batched audit writer when it is running;
+    otherwise it is written and committed on the given session, or on a
+    short-lived session of its own if db is None.
+    """
+    values["log_id"] = uuid.uuid4()
+    values["created_at"] = datetime.utcnow()
+    
+    audit_entry = AuditLog(**values)
+    if not audit_writer.submit(values):
+        if db is None:
+            with db_session() as session:
+                session.add(audit_entry)
+        else:
+            db.add(audit_entry)
+            db.commit()
+    
+    return audit_entry
 
 
 def log_transaction(
@@ -37,18 +80,15 @@ def log_transaction(
     Returns:
         Created AuditLog entry
     """
-    audit_entry = AuditLog(
+    audit_entry = _write_entry(
+        db,
         user_id_hash=_hash_user_id(user_id),
         action="transaction",
         event_type=event_type,
-        details=json.dumps(details),
+        details=details,
         ip_address=ip_address,
     )
     
-    db.add(audit_entry)
-    db.commit()
-    db.refresh(audit_entry)
-    
     logger.info(
         "audit_transaction_logged",
         user_id_hash=audit_entry.user_id_hash,
@@ -82,22 +122,19 @@ def log_policy_decision(
     Returns:
         Created AuditLog entry
     """
-    audit_entry = AuditLog(
+    audit_entry = _write_entry(
+        db,
         user_id_hash=_hash_user_id(user_id),
         action="policy_decision",
         event_type=decision,
-        details=json.dumps({
+        details={
             "items": items,
             "approved_amount": approved_amount,
             **details,
-        }),
+        },
         ip_address=ip_address,
     )
     
-    db.add(audit_entry)
-    db.commit()
-    db.refresh(audit_entry)
-    
     logger.info(
         "audit_policy_decision_logged",
         user_id_hash=audit_entry.user_id_hash,
@@ -130,18 +167,15 @@ def log_webhook_event(
     """
     user_id_hash = _hash_user_id(user_id) if user_id else None
     
-    audit_entry = AuditLog(
+    audit_entry = _write_entry(
+        db,
         user_id_hash=user_id_hash or "system",
         action="webhook",
         event_type=event_type,
-        details=json.dumps(details),
+        details=details,
         ip_address=ip_address,
     )
     
-    db.add(audit_entry)
-    db.commit()
-    db.refresh(audit_entry)
-    
     logger.info(
         "audit_webhook_logged",
         event_type=event_type,
@@ -152,7 +186,7 @@ def log_webhook_event(
 
 
 def log_api_request(
-    db: Session,
+    db: Optional[Session],
     user_id: UUID,
     endpoint: str,
     method: str,
@@ -163,7 +197,7 @@ def log_api_request(
     Log an API request.
     
     Args:
-        db: Database session
+        db: Database session (None to use a short-lived session)
         user_id: User UUID
         endpoint: API endpoint
         method: HTTP method
@@ -173,17 +207,60 @@ def log_api_request(
     Returns:
         Created AuditLog entry
     """
-    audit_entry = AuditLog(
+    audit_entry = _write_entry(
+        db,
         user_id_hash=_hash_user_id(user_id),
         action="api_request",
         event_type=f"{method} {endpoint}",
-        details=json.dumps(details),
+        details=details,
         ip_address=ip_address,
     )
     
-    db.add(audit_entry)
-    db.commit()
-    db.refresh(audit_entry)
-    
     return audit_entry
 
+
+async def log_api_request_async(
+    session_factory: Callable[[], ContextManager[Session]],
+    user_id: UUID,
+    endpoint: str,
+    method: str,
+    details: Dict[str, Any],
+    ip_address: Optional[str] = None,
+) -> None:
+    """
+    Log an API request off the request path.
+    
+    Meant to run as a FastAPI background task, so it never uses the
+    request's session: the row goes to the batched audit writer, or, when
+    the writer is not running, is written on a session from
+    session_factory (the get_session_factory dependency). A failed write
+    is logged with the entry and re-raised.
+    
+    Args:
+        session_factory: Context-managed session factory for the fallback write
+        user_id: User UUID
+        endpoint: API endpoint
+        method: HTTP method
+        details: Request details
+        ip_address: Optional IP address
+    """
+    if audit_writer.running:
+        log_api_request(None, user_id, endpoint, method, details, ip_address)
+        return
+    
+    def write() -> None:
+        with session_factory() as session:
+            log_api_request(session, user_id, endpoint, method, details, ip_address)
+    
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, write)
+    except Exception as e:
+        logger.error(
+            "audit_api_request_failed",
+            endpoint=endpoint,
+            method=method,
+            user_id_hash=_hash_user_id(user_id),
+            details=details,
+            error=str(e),
+        )
+        raise
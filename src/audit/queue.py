@@ -0,0 +1,188 @@
+"""Batched audit log writer"""
+
+import os
+import asyncio
+from typing import Any, Callable, ContextManager, Dict, List, Optional, Tuple
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+import structlog
+
+from ..db.models import AuditLog
+from ..db.connection import db_session
+
+logger = structlog.get_logger()
+
+# Flush when this many rows are pending, or after this long, whichever comes first
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+AUDIT_BULK_INTERVAL_MS = int(os.getenv("AUDIT_BULK_INTERVAL_MS", "100"))
+# Rows the queue may hold; past this, submit() declines and the caller writes inline
+AUDIT_QUEUE_MAX = int(os.getenv("AUDIT_QUEUE_MAX", "10000"))
+
+# A failed flush keeps its rows and is retried, backing off up to this long;
+# on shutdown each remaining batch gets this many attempts
+AUDIT_RETRY_MAX_S = float(os.getenv("AUDIT_RETRY_MAX_S", "5"))
+AUDIT_FLUSH_ATTEMPTS = 3
+
+
+class AuditWriter:
+    """
+    Buffers audit rows in an asyncio queue and inserts them in batches.
+    
+    Rows may be submitted from the event loop or from threadpool workers
+    (sync routes). Until start() is called, or while the queue is full,
+    submit() returns False and callers are expected to write the row
+    themselves.
+    
+    A row taken off the queue stays in the pending list until its batch
+    has been committed: a failed flush is retried with backoff, and stop()
+    writes whatever is pending, including a batch cut short by shutdown.
+    """
+    
+    def __init__(
+        self,
+        batch_size: int = AUDIT_BATCH_SIZE,
+        interval_ms: int = AUDIT_BULK_INTERVAL_MS,
+        session_factory: Callable[[], ContextManager[Session]] = db_session,
+        queue_max: int = AUDIT_QUEUE_MAX,
+    ):
+        self.batch_size = batch_size
+        self.interval = interval_ms / 1000
+        self.queue_max = queue_max
+        self.session_factory = session_factory
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending: List[Dict[str, Any]] = []
+        self._inflight: Optional[Tuple[asyncio.Future, int]] = None
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    def start(self) -> None:
+        """Start the drainer task on the running event loop"""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.queue_max)
+        self._task = self._loop.create_task(self._drain())
+        logger.info("audit_writer_started", batch_size=self.batch_size, interval_ms=int(self.interval * 1000))
+    
+    async def stop(self) -> None:
+        """Stop the drainer and write every row still pending or queued"""
+        if not self.running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        
+        # A flush the cancellation interrupted keeps running in its thread
+        if self._inflight is not None:
+            future, count = self._inflight
+            if await future:
+                del self._pending[:count]
+            self._inflight = None
+        
+        self._pending.extend(self._take_all())
+        for _ in range(AUDIT_FLUSH_ATTEMPTS):
+            while self._pending:
+                batch = self._pending[:self.batch_size]
+                if not await self._loop.run_in_executor(None, self._flush, batch):
+                    break
+                del self._pending[:len(batch)]
+            if not self._pending:
+                break
+        if self._pending:
+            # Last resort; ids only, the rows carry IPs and request details
+            logger.error(
+                "audit_rows_unflushed",
+                count=len(self._pending),
+                log_ids=[str(row["log_id"]) for row in self._pending],
+            )
+            self._pending = []
+        
+        self._task = None
+        self._queue = None
+        self._loop = None
+    
+    def submit(self, row: Dict[str, Any]) -> bool:
+        """
+        Queue an audit row for the next batch.
+        
+        Args:
+            row: Column values for an AuditLog insert
+            
+        Returns:
+            True if queued, False if the writer is not running or the queue is full
+        """
+        if not self.running or self._queue.full():
+            return False
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self._loop:
+            self._queue.put_nowait(row)
+        else:
+            self._loop.call_soon_threadsafe(self._put, row)
+        return True
+    
+    def _put(self, row: Dict[str, Any]) -> None:
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            # Another thread took the last slot after our full() check; the
+            # row was already accepted, so it joins the pending batch instead
+            self._pending.append(row)
+    
+    def _take_all(self) -> List[Dict[str, Any]]:
+        rows = []
+        while not self._queue.empty():
+            rows.append(self._queue.get_nowait())
+        return rows
+    
+    async def _drain(self) -> None:
+        failures = 0
+        while True:
+            if not self._pending:
+                self._pending.append(await self._queue.get())
+            deadline = self._loop.time() + self.interval
+            while len(self._pending) < self.batch_size:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    self._pending.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            batch = self._pending[:self.batch_size]
+            future = self._loop.run_in_executor(None, self._flush, batch)
+            self._inflight = (future, len(batch))
+            flushed = await asyncio.shield(future)
+            self._inflight = None
+            
+            if flushed:
+                del self._pending[:len(batch)]
+                failures = 0
+            else:
+                # Keep the rows and back off; new rows keep queueing meanwhile
+                failures += 1
+                await asyncio.sleep(min(self.interval * 2 ** failures, AUDIT_RETRY_MAX_S))
+    
+    def _flush(self, rows: List[Dict[str, Any]]) -> bool:
+        """Insert a batch of audit rows in a single statement and commit once"""
+        try:
+            with self.session_factory() as session:
+                session.execute(insert(AuditLog), rows)
+            logger.info("audit_batch_flushed", count=len(rows))
+            return True
+        except Exception as e:
+            logger.error("audit_batch_flush_failed", count=len(rows), error=str(e))
+            return False
+
+
+# Global audit writer instance
+audit_writer = AuditWriter()
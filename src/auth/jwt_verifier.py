@@ -1,8 +1,13 @@
 """JWT verification for Core service tokens"""
 
 import os
+import time
+import hashlib
+import threading
 import jwt
 from typing import Optional, Dict
+from cachetools import TTLCache
+from cryptography.hazmat.primitives.serialization import load_pem_public_key
 from fastapi import HTTPException, Security
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import structlog
@@ -13,6 +18,39 @@ logger = structlog.get_logger()
 JWT_PUBLIC_KEY = os.getenv("JWT_PUBLIC_KEY", "")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "RS256")
 
+
+def _load_verification_key(key: str, algorithm: str):
+    """Parse the configured key once so jwt.decode doesn't re-parse the PEM per token"""
+    if not key:
+        return None
+    if algorithm.startswith("HS"):
+        # Shared secret, nothing to parse
+        return key
+    # A malformed key fails here, at startup, rather than on every request
+    return load_pem_public_key(key.encode())
+
+
+_VERIFICATION_KEY = _load_verification_key(JWT_PUBLIC_KEY, JWT_ALGORITHM)
+
+if _VERIFICATION_KEY is None:
+    logger.warning("jwt_public_key_missing")
+
+# Verified-token cache (keyed by SHA-256 of the raw token)
+JWT_CACHE_TTL = int(os.getenv("JWT_CACHE_TTL", "30"))
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "10000"))
+
+_jwt_cache: TTLCache = TTLCache(maxsize=JWT_CACHE_SIZE, ttl=JWT_CACHE_TTL)
+_jwt_cache_lock = threading.Lock()
+
+# Offline validation only: signature + expiry checked locally, no introspection
+# call to Core. Revocation relies on Core issuing short-lived tokens.
+_JWT_OPTIONS = {
+    "verify_signature": True,
+    "verify_exp": True,
+    "verify_aud": False,  # Adjust based on Core service requirements
+}
+_JWT_ALGORITHMS = [JWT_ALGORITHM]
+
 security = HTTPBearer()
 
 
@@ -20,6 +58,10 @@ def verify_jwt(token: str) -> Dict:
     """
     Verify JWT token from Core service.
     
+    Successfully verified tokens are cached for up to JWT_CACHE_TTL seconds
+    (never past their own exp claim) so repeat requests skip signature
+    verification. Tokens that fail validation are never cached.
+    
     Args:
         token: JWT token string
         
@@ -29,24 +71,31 @@ def verify_jwt(token: str) -> Dict:
     Raises:
         HTTPException: If token is invalid, expired, or missing required claims
     """
-    if not JWT_PUBLIC_KEY:
+    if _VERIFICATION_KEY is None:
         logger.error("jwt_public_key_missing")
         raise HTTPException(
             status_code=500,
             detail="JWT verification not configured"
         )
     
+    cache_key = hashlib.sha256(token.encode()).digest()
+    with _jwt_cache_lock:
+        cached = _jwt_cache.get(cache_key)
+    if cached is not None:
+        exp = cached.get("exp")
+        if exp is None or exp > time.time():
+            return cached
+        with _jwt_cache_lock:
+            _jwt_cache.pop(cache_key, None)
+    
     try:
         # Decode and verify token
         payload = jwt.decode(
             token,
-            JWT_PUBLIC_KEY,
-            algorithms=[JWT_ALGORITHM],
-            options={
-                "verify_signature": True,
-                "verify_exp": True,
-                "verify_aud": False,  # Adjust based on Core service requirements
-            }
+            _VERIFICATION_KEY,
+            algorithms=_JWT_ALGORITHMS,
+            options=_JWT_OPTIONS,
+            leeway=0,
         )
         
         # Validate required claims
@@ -57,27 +106,26 @@ def verify_jwt(token: str) -> Dict:
                 detail="Token missing required claim: user_id"
             )
         
-        logger.info("jwt_verified", user_id=payload.get("user_id"))
+        logger.debug("jwt_verified", user_id=payload.get("user_id"))
+        
+        with _jwt_cache_lock:
+            _jwt_cache[cache_key] = payload
+        
         return payload
         
     except jwt.ExpiredSignatureError:
-        logger.warning("jwt_expired")
+        # Routine traffic; only worth seeing when debugging
+        logger.debug("jwt_expired")
         raise HTTPException(
             status_code=401,
             detail="Token has expired"
         )
     except jwt.InvalidTokenError as e:
-        logger.warning("jwt_invalid", error=str(e))
+        logger.warning("jwt_invalid", error=type(e).__name__)
         raise HTTPException(
             status_code=401,
             detail="Invalid token"
         )
-    except Exception as e:
-        logger.error("jwt_verification_error", error=str(e))
-        raise HTTPException(
-            status_code=500,
-            detail="Token verification failed"
-        )
 
 
 async def get_current_user(
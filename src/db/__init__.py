@@ -1,14 +1,16 @@
 """Database connection and models"""
 
-from .connection import get_db, engine, Base
-from .models import User, Transaction, StripeAccount, Campaign, AuditLog
+from .connection import get_db, get_session_factory, engine, Base
+from .models import User, Transaction, UserBalance, StripeAccount, Campaign, AuditLog
 
 __all__ = [
     "get_db",
+    "get_session_factory",
     "engine",
     "Base",
     "User",
     "Transaction",
+    "UserBalance",
     "StripeAccount",
     "Campaign",
     "AuditLog",
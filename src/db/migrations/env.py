@@ -11,7 +11,7 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))))
 
 from src.db.connection import Base
-from src.db.models import User, Transaction, StripeAccount, Campaign, AuditLog
+from src.db.models import User, Transaction, UserBalance, StripeAccount, Campaign, AuditLog
 
 # this is the Alembic Config object
 config = context.config
@@ -0,0 +1,46 @@
+"""Store audit log details as JSONB
+
+Revision ID: 002_audit_details_jsonb
+Revises: 001_initial
+Create Date: 2026-10-14 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '002_audit_details_jsonb'
+down_revision = '001_initial'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.alter_column(
+        'audit_logs',
+        'details',
+        type_=postgresql.JSONB(),
+        existing_type=sa.Text(),
+        existing_nullable=True,
+        postgresql_using='details::jsonb',
+    )
+    op.create_index(
+        'idx_audit_details_gin',
+        'audit_logs',
+        ['details'],
+        postgresql_using='gin',
+        postgresql_ops={'details': 'jsonb_path_ops'},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_audit_details_gin', table_name='audit_logs')
+    op.alter_column(
+        'audit_logs',
+        'details',
+        type_=sa.Text(),
+        existing_type=postgresql.JSONB(),
+        existing_nullable=True,
+        postgresql_using='details::text',
+    )
@@ -0,0 +1,40 @@
+"""Add user_balances running-balance table
+
+Revision ID: 003_user_balances
+Revises: 002_audit_details_jsonb
+Create Date: 2026-10-14 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '003_user_balances'
+down_revision = '002_audit_details_jsonb'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user_balances',
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('balance', sa.Numeric(12, 2), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id']),
+    )
+
+    # Seed from the existing ledger
+    op.execute(
+        """
+        INSERT INTO user_balances (user_id, balance, updated_at)
+        SELECT user_id, SUM(amount), now()
+        FROM transactions
+        GROUP BY user_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('user_balances')
@@ -0,0 +1,37 @@
+"""Track the newest ledger entry covered by each running balance
+
+Revision ID: 004_user_balance_cursor
+Revises: 003_user_balances
+Create Date: 2026-10-14 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004_user_balance_cursor'
+down_revision = '003_user_balances'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('user_balances', sa.Column('last_tx_at', sa.DateTime(), nullable=True))
+
+    # Balances were seeded from the full ledger, so they cover its newest row
+    op.execute(
+        """
+        UPDATE user_balances b
+        SET last_tx_at = t.last_tx_at
+        FROM (
+            SELECT user_id, MAX(created_at) AS last_tx_at
+            FROM transactions
+            GROUP BY user_id
+        ) t
+        WHERE t.user_id = b.user_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('user_balances', 'last_tx_at')
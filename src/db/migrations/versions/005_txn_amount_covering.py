@@ -0,0 +1,27 @@
+"""Add covering index for per-user ledger sums
+
+Revision ID: 005_txn_amount_covering
+Revises: 004_user_balance_cursor
+Create Date: 2026-10-14 00:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '005_txn_amount_covering'
+down_revision = '004_user_balance_cursor'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'idx_user_amount_covering',
+        'transactions',
+        ['user_id'],
+        postgresql_include=['amount'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_user_amount_covering', table_name='transactions')
@@ -0,0 +1,24 @@
+"""Extend idx_user_created with the keyset tiebreaker
+
+Revision ID: 006_user_created_keyset
+Revises: 005_txn_amount_covering
+Create Date: 2026-10-14 00:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '006_user_created_keyset'
+down_revision = '005_txn_amount_covering'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_index('idx_user_created', table_name='transactions')
+    op.create_index('idx_user_created', 'transactions', ['user_id', 'created_at', 'transaction_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_user_created', table_name='transactions')
+    op.create_index('idx_user_created', 'transactions', ['user_id', 'created_at'])
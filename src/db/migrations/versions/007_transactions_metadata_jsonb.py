@@ -0,0 +1,38 @@
+"""Store transaction metadata as JSONB
+
+Revision ID: 007_txn_metadata_jsonb
+Revises: 006_user_created_keyset
+Create Date: 2026-10-14 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '007_txn_metadata_jsonb'
+down_revision = '006_user_created_keyset'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.alter_column(
+        'transactions',
+        'metadata',
+        type_=postgresql.JSONB(),
+        existing_type=sa.Text(),
+        existing_nullable=True,
+        postgresql_using='metadata::jsonb',
+    )
+
+
+def downgrade() -> None:
+    op.alter_column(
+        'transactions',
+        'metadata',
+        type_=sa.Text(),
+        existing_type=postgresql.JSONB(),
+        existing_nullable=True,
+        postgresql_using='metadata::text',
+    )
@@ -0,0 +1,26 @@
+"""Replace the duplicate stripe_ref btree indexes with one hash index
+
+Revision ID: 008_stripe_ref_hash_index
+Revises: 007_txn_metadata_jsonb
+Create Date: 2026-10-14 00:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '008_stripe_ref_hash_index'
+down_revision = '007_txn_metadata_jsonb'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_index('ix_transactions_stripe_ref', table_name='transactions')
+    op.drop_index('idx_stripe_ref', table_name='transactions')
+    op.create_index('idx_stripe_ref', 'transactions', ['stripe_ref'], postgresql_using='hash')
+
+
+def downgrade() -> None:
+    op.drop_index('idx_stripe_ref', table_name='transactions')
+    op.create_index('idx_stripe_ref', 'transactions', ['stripe_ref'])
+    op.create_index('ix_transactions_stripe_ref', 'transactions', ['stripe_ref'])
@@ -0,0 +1,47 @@
+"""Cover user_id in the stripe_account_id index
+
+Revision ID: 009_stripe_account_covering
+Revises: 008_stripe_ref_hash_index
+Create Date: 2026-10-14 00:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '009_stripe_account_covering'
+down_revision = '008_stripe_ref_hash_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY can't run inside the migration transaction. Build the
+    # covering index before dropping the old one so lookups stay indexed.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_stripe_accounts_acct_id',
+            'stripe_accounts',
+            ['stripe_account_id'],
+            postgresql_include=['user_id'],
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            'ix_stripe_accounts_stripe_account_id',
+            table_name='stripe_accounts',
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_stripe_accounts_stripe_account_id',
+            'stripe_accounts',
+            ['stripe_account_id'],
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            'ix_stripe_accounts_acct_id',
+            table_name='stripe_accounts',
+            postgresql_concurrently=True,
+        )
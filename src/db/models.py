@@ -1,7 +1,7 @@
 """SQLAlchemy models for the rewards service"""
 
 from sqlalchemy import Column, String, Numeric, DateTime, ForeignKey, Text, Boolean, Index
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
@@ -18,8 +18,10 @@ class User(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
-    transactions = relationship("Transaction", back_populates="user")
+    # A user's whole ledger is never lazy-loaded; query transactions explicitly
+    transactions = relationship("Transaction", back_populates="user", lazy="raise")
     stripe_account = relationship("StripeAccount", back_populates="user", uselist=False)
+    balance = relationship("UserBalance", back_populates="user", uselist=False)
 
 
 class Transaction(Base):
@@ -30,28 +32,47 @@ class Transaction(Base):
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.user_id"), nullable=False, index=True)
     amount = Column(Numeric(10, 2), nullable=False)  # Positive for earn, negative for spend
     reason = Column(String(50), nullable=False)  # 'earn', 'spend', 'redeem'
-    stripe_ref = Column(String(255), nullable=True, index=True)  # Stripe transaction reference
+    stripe_ref = Column(String(255), nullable=True)  # Stripe transaction reference
     category = Column(String(100), nullable=True)  # Item category if applicable
-    metadata = Column(Text, nullable=True)  # JSON string for additional data
+    # "metadata" is reserved on declarative classes; the column keeps its name
+    meta = Column("metadata", JSONB(none_as_null=True), nullable=True)  # Additional data
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
 
     # Relationships
-    user = relationship("User", back_populates="transactions")
+    # Identity-map hits are fine, but a per-row SELECT raises; opt in with selectinload
+    user = relationship("User", back_populates="transactions", lazy="raise_on_sql")
 
     # Indexes for common queries
     __table_args__ = (
-        Index("idx_user_created", "user_id", "created_at"),
-        Index("idx_stripe_ref", "stripe_ref"),
+        # Matches the history ordering and keyset cursor (created_at, transaction_id)
+        Index("idx_user_created", "user_id", "created_at", "transaction_id"),
+        # Only ever probed by equality (idempotency checks); a hash index stays small
+        Index("idx_stripe_ref", "stripe_ref", postgresql_using="hash"),
+        # Lets SUM(amount) per user run as an index-only scan
+        Index("idx_user_amount_covering", "user_id", postgresql_include=["amount"]),
     )
 
 
+class UserBalance(Base):
+    """Running balance per user, updated in the same transaction as each ledger insert"""
+    __tablename__ = "user_balances"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.user_id"), primary_key=True)
+    balance = Column(Numeric(12, 2), default=0, nullable=False)
+    last_tx_at = Column(DateTime, nullable=True)  # created_at of the newest ledger entry folded into balance
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    # Relationships
+    user = relationship("User", back_populates="balance")
+
+
 class StripeAccount(Base):
     """Stripe Connect account mapping"""
     __tablename__ = "stripe_accounts"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.user_id"), unique=True, nullable=False, index=True)
-    stripe_account_id = Column(String(255), unique=True, nullable=False, index=True)
+    stripe_account_id = Column(String(255), unique=True, nullable=False)
     account_type = Column(String(50), nullable=False)  # 'express' or 'custom'
     is_active = Column(Boolean, default=True, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -60,6 +81,11 @@ class StripeAccount(Base):
     # Relationships
     user = relationship("User", back_populates="stripe_account")
 
+    __table_args__ = (
+        # Resolves transfer destinations to users as an index-only scan
+        Index("ix_stripe_accounts_acct_id", "stripe_account_id", postgresql_include=["user_id"]),
+    )
+
 
 class Campaign(Base):
     """Reward campaigns/promotions (optional)"""
@@ -80,15 +106,21 @@ class AuditLog(Base):
     __tablename__ = "audit_logs"
 
     log_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id_hash = Column(String(64), nullable=False, index=True)  # SHA-256 hash of user_id
+    user_id_hash = Column(String(64), nullable=False, index=True)  # BLAKE2b-128 hex of user_id (SHA-256 on older rows)
     action = Column(String(100), nullable=False)  # 'transaction', 'policy_decision', 'webhook', etc.
     event_type = Column(String(100), nullable=False)  # 'earn', 'spend', 'approve', 'deny', etc.
-    details = Column(Text, nullable=True)  # JSON string with event details
+    details = Column(JSONB, nullable=True)  # Event details
     ip_address = Column(String(45), nullable=True)  # IPv4 or IPv6
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
 
     # Indexes
     __table_args__ = (
         Index("idx_user_action_created", "user_id_hash", "action", "created_at"),
+        Index(
+            "idx_audit_details_gin",
+            "details",
+            postgresql_using="gin",
+            postgresql_ops={"details": "jsonb_path_ops"},
+        ),
     )
 
@@ -2,15 +2,27 @@
 
 from .transactions import (
     get_user_balance,
+    get_user_balances_bulk,
     create_transaction,
+    create_debit_transaction,
+    create_transactions_bulk,
     get_transaction_history,
+    get_transaction_page,
+    encode_cursor,
+    decode_cursor,
     calculate_balance_from_ledger,
 )
 
 __all__ = [
     "get_user_balance",
+    "get_user_balances_bulk",
     "create_transaction",
+    "create_debit_transaction",
+    "create_transactions_bulk",
     "get_transaction_history",
+    "get_transaction_page",
+    "encode_cursor",
+    "decode_cursor",
     "calculate_balance_from_ledger",
 ]
 
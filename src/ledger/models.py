@@ -1,6 +1,6 @@
 """Pydantic models for ledger operations"""
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, AliasChoices
 from decimal import Decimal
 from uuid import UUID
 from datetime import datetime
@@ -24,7 +24,8 @@ class TransactionResponse(BaseModel):
     reason: str
     stripe_ref: Optional[str]
     category: Optional[str]
-    metadata: Optional[str]
+    # ORM rows expose the column as `meta`
+    metadata: Optional[Dict[str, Any]] = Field(None, validation_alias=AliasChoices("meta", "metadata"))
     created_at: datetime
 
     model_config = {"from_attributes": True}
@@ -40,7 +41,8 @@ class BalanceResponse(BaseModel):
 class TransactionHistoryResponse(BaseModel):
     """Response model for transaction history"""
     transactions: list[TransactionResponse]
-    total: int
+    total: Optional[int] = None  # Omitted on `before` pages; the first page carries it
     limit: int
     offset: int
+    next_cursor: Optional[str] = None  # Pass as `before` to fetch the next page
 
@@ -1,22 +1,168 @@
 """Immutable ledger transaction operations"""
 
-from typing import List, Optional
+import base64
+import uuid
+from typing import List, Optional, Tuple, Dict, Any
+from datetime import datetime
 from decimal import Decimal
 from uuid import UUID
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy.orm import Session, raiseload
+from sqlalchemy import func, desc, tuple_, select, update, insert, bindparam, case, column, exists, literal_column, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 import structlog
 
-from ..db.models import Transaction, User
+from ..db.models import Transaction, User, UserBalance
 from ..db.connection import db_session
 
 logger = structlog.get_logger()
 
 
+# ON CONFLICT DO UPDATE subqueries are not correlated to the INSERT target by
+# SQLAlchemy, so they name the conflicting row's columns literally
+_CONFLICT_USER_ID = literal_column("user_balances.user_id")
+_CONFLICT_LAST_TX_AT = literal_column("user_balances.last_tx_at")
+
+
+def _residual(aggregate, user_id=UserBalance.user_id, last_tx_at=UserBalance.last_tx_at):
+    """
+    aggregate over ledger rows newer than the running balance's cursor.
+    
+    Correlated to user_balances; pass the _CONFLICT_* columns when used in
+    an upsert's SET clause.
+    """
+    return select(aggregate).where(
+        Transaction.user_id == user_id,
+        Transaction.created_at > last_tx_at,
+    ).scalar_subquery()
+
+
+def _residual_sum(**target):
+    """Sum of the ledger rows the running balance does not cover yet"""
+    return _residual(func.coalesce(func.sum(Transaction.amount), 0), **target)
+
+
+def _residual_last_tx_at(**target):
+    """Newest created_at among the ledger rows the running balance does not cover yet"""
+    return _residual(func.max(Transaction.created_at), **target)
+
+
+def _opening(aggregate, user_id, default=None):
+    """
+    aggregate over a user's whole ledger, for the insert branch of a balance
+    upsert; only evaluated when the user has no user_balances row yet.
+    """
+    return case(
+        (exists().where(UserBalance.user_id == user_id), default),
+        else_=select(aggregate).where(Transaction.user_id == user_id).scalar_subquery(),
+    )
+
+
+def _fold_into_balance(stmt, deltas):
+    """
+    ON CONFLICT clause shared by the balance upserts.
+    
+    Besides the new entries (deltas, a CTE of user_id and amount), the
+    existing row absorbs any residual ledger rows and moves its cursor past
+    them, so rows written out of band are never skipped. The insert branch
+    opens the balance from the user's whole ledger instead.
+    """
+    conflict = {"user_id": _CONFLICT_USER_ID, "last_tx_at": _CONFLICT_LAST_TX_AT}
+    return stmt.on_conflict_do_update(
+        index_elements=[UserBalance.__table__.c.user_id],
+        set_={
+            "balance": (
+                UserBalance.__table__.c.balance
+                + _residual_sum(**conflict)
+                + select(deltas.c.amount).where(deltas.c.user_id == _CONFLICT_USER_ID).scalar_subquery()
+            ),
+            "last_tx_at": func.greatest(
+                UserBalance.__table__.c.last_tx_at,
+                stmt.excluded.last_tx_at,
+                _residual_last_tx_at(**conflict),
+            ),
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+
+
+def _param(name: str, column):
+    """Named bind parameter typed like column; names avoid the reserved column names"""
+    return bindparam(f"p_{name}", type_=column.type)
+
+
+def _ledger_insert_statement():
+    """
+    Ledger insert plus balance upsert as one statement: the INSERT is a
+    data-modifying CTE the upsert selects from. The rest of the statement
+    does not see the new row, so residual and opening sums exclude it.
+    
+    Built on the Core tables so executing it with parameters does not
+    switch the Session into ORM bulk-insert mode.
+    """
+    table = Transaction.__table__
+    balances = UserBalance.__table__
+    ledger_insert = insert(table).values({
+        name: _param(name, table.c[name])
+        for name in [
+            "transaction_id", "user_id", "amount", "reason",
+            "stripe_ref", "category", "metadata", "created_at",
+        ]
+    }).returning(table.c.user_id, table.c.amount, table.c.created_at).cte("ledger_insert")
+    
+    stmt = pg_insert(balances).from_select(
+        ["user_id", "balance", "last_tx_at", "updated_at"],
+        select(
+            ledger_insert.c.user_id,
+            ledger_insert.c.amount + _opening(func.coalesce(func.sum(table.c.amount), 0), ledger_insert.c.user_id, 0),
+            func.greatest(ledger_insert.c.created_at, _opening(func.max(table.c.created_at), ledger_insert.c.user_id)),
+            _param("updated_at", balances.c.updated_at),
+        ),
+    )
+    return _fold_into_balance(stmt, ledger_insert).add_cte(ledger_insert)
+
+
+def _debit_statement():
+    """
+    Conditional balance decrement plus ledger insert as one statement: the
+    UPDATE is a data-modifying CTE and the INSERT selects from it, so no
+    row is inserted when the balance, including residual ledger rows,
+    does not cover p_amount. The residual is folded in by the same UPDATE.
+    """
+    table = Transaction.__table__
+    balances = UserBalance.__table__
+    amount = _param("amount", balances.c.balance)
+    created_at = _param("created_at", balances.c.last_tx_at)
+    debit = update(balances).where(
+        balances.c.user_id == _param("user_id", balances.c.user_id),
+        balances.c.balance + _residual_sum() >= amount,
+    ).values(
+        balance=balances.c.balance + _residual_sum() - amount,
+        last_tx_at=func.greatest(balances.c.last_tx_at, created_at, _residual_last_tx_at()),
+        updated_at=created_at,
+    ).returning(balances.c.user_id).cte("debit")
+    
+    columns = ["transaction_id", "reason", "stripe_ref", "category", "metadata", "created_at"]
+    rows = select(
+        debit.c.user_id,
+        _param("entry_amount", table.c.amount).label("amount"),
+        *[_param(name, table.c[name]).label(name) for name in columns],
+    )
+    return insert(table).from_select(
+        ["user_id", "amount", *columns],
+        rows,
+    ).add_cte(debit).returning(table.c.transaction_id)
+
+
+# Built once: constructing these statements costs more Python time than
+# executing them, and SQLAlchemy's compiled cache only skips compilation
+_LEDGER_INSERT_STMT = _ledger_insert_statement()
+_DEBIT_STMT = _debit_statement()
+
+
 def calculate_balance_from_ledger(db: Session, user_id: UUID) -> Decimal:
     """
     Calculate user balance by summing all transactions.
-    Balance is never stored - always derived from ledger.
+    The ledger is the source of truth; use this to reconcile user_balances.
     
     Args:
         db: Database session
@@ -36,6 +182,10 @@ def get_user_balance(db: Session, user_id: UUID) -> Decimal:
     """
     Get current user balance.
     
+    Reads the running balance kept in user_balances plus the residual sum of
+    any ledger rows newer than the last entry it covers (normally none), so a
+    primary-key lookup replaces aggregating the user's whole ledger.
+    
     Args:
         db: Database session
         user_id: User UUID
@@ -43,11 +193,92 @@ def get_user_balance(db: Session, user_id: UUID) -> Decimal:
     Returns:
         Current balance
     """
-    balance = calculate_balance_from_ledger(db, user_id)
+    result = db.execute(
+        select(UserBalance.balance + _residual_sum()).where(UserBalance.user_id == user_id)
+    ).scalar_one_or_none()
+    if result is None:
+        # No running balance yet; anything in the ledger is residual
+        balance = calculate_balance_from_ledger(db, user_id)
+    else:
+        balance = Decimal(result)
     logger.info("balance_retrieved", user_id=str(user_id), balance=float(balance))
     return balance
 
 
+def get_user_balances_bulk(db: Session, user_ids: List[UUID]) -> Dict[UUID, Decimal]:
+    """
+    Get current balances for many users at once.
+    
+    One query against user_balances covers every user with a running
+    balance; users without one are summed from the ledger in a second,
+    grouped query. Results are live, like get_user_balance.
+    
+    Args:
+        db: Database session
+        user_ids: User UUIDs
+        
+    Returns:
+        Mapping of user_id to balance (0 for users with no transactions)
+    """
+    if not user_ids:
+        return {}
+    
+    rows = db.execute(
+        select(UserBalance.user_id, UserBalance.balance + _residual_sum()).where(
+            UserBalance.user_id.in_(user_ids)
+        )
+    ).all()
+    balances = {user_id: Decimal(balance) for user_id, balance in rows}
+    
+    missing = [user_id for user_id in user_ids if user_id not in balances]
+    if missing:
+        rows = db.execute(
+            select(Transaction.user_id, func.sum(Transaction.amount)).where(
+                Transaction.user_id.in_(missing)
+            ).group_by(Transaction.user_id)
+        ).all()
+        balances.update({user_id: Decimal(total) for user_id, total in rows})
+    
+    return {user_id: balances.get(user_id, Decimal(0)) for user_id in user_ids}
+
+
+def _apply_to_balances(db: Session, entries: List[Tuple[UUID, Decimal, datetime]]) -> None:
+    """
+    Fold ledger entries into the users' running balances.
+    
+    Entries are (user_id, amount, created_at). They are summed per user first,
+    since one upsert cannot touch the same row twice, then applied in a
+    single statement within the caller's DB transaction. Must run before the
+    entries' ledger rows are inserted, or the residual would count them twice.
+    """
+    totals: Dict[UUID, Tuple[Decimal, datetime]] = {}
+    for user_id, amount, created_at in entries:
+        total, last_tx_at = totals.get(user_id, (Decimal(0), created_at))
+        totals[user_id] = (total + amount, max(last_tx_at, created_at))
+    
+    balances = UserBalance.__table__
+    table = Transaction.__table__
+    deltas = select(
+        values(
+            column("user_id", balances.c.user_id.type),
+            column("amount", balances.c.balance.type),
+            column("last_tx_at", balances.c.last_tx_at.type),
+            name="entries",
+        ).data([(user_id, total, last_tx_at) for user_id, (total, last_tx_at) in totals.items()])
+    ).cte("deltas")
+    
+    stmt = pg_insert(balances).from_select(
+        ["user_id", "balance", "last_tx_at", "updated_at"],
+        select(
+            deltas.c.user_id,
+            deltas.c.amount + _opening(func.coalesce(func.sum(table.c.amount), 0), deltas.c.user_id, 0),
+            func.greatest(deltas.c.last_tx_at, _opening(func.max(table.c.created_at), deltas.c.user_id)),
+            bindparam("p_updated_at", datetime.utcnow(), type_=balances.c.updated_at.type),
+        ),
+    )
+    db.execute(_fold_into_balance(stmt, deltas).add_cte(deltas))
+
+
 def create_transaction(
     db: Session,
     user_id: UUID,
@@ -59,6 +290,7 @@ def create_transaction(
 ) -> Transaction:
     """
     Create an immutable transaction in the ledger.
+    The user's running balance is updated in the same commit.
     
     Args:
         db: Database session
@@ -81,21 +313,31 @@ def create_transaction(
     if amount == 0:
         raise ValueError("Transaction amount cannot be zero")
     
-    import json
-    metadata_json = json.dumps(metadata) if metadata else None
-    
+    # All column values are set client-side; the returned object is never
+    # added to the session, so it needs no reload after commit
     transaction = Transaction(
+        transaction_id=uuid.uuid4(),
         user_id=user_id,
         amount=amount,
         reason=reason,
         stripe_ref=stripe_ref,
         category=category,
-        metadata=metadata_json,
+        meta=metadata or None,
+        created_at=datetime.utcnow(),
     )
     
-    db.add(transaction)
+    db.execute(_LEDGER_INSERT_STMT, {
+        "p_transaction_id": transaction.transaction_id,
+        "p_user_id": user_id,
+        "p_amount": amount,
+        "p_reason": reason,
+        "p_stripe_ref": stripe_ref,
+        "p_category": category,
+        "p_metadata": transaction.meta,
+        "p_created_at": transaction.created_at,
+        "p_updated_at": datetime.utcnow(),
+    })
     db.commit()
-    db.refresh(transaction)
     
     logger.info(
         "transaction_created",
@@ -109,38 +351,269 @@ def create_transaction(
     return transaction
 
 
-def get_transaction_history(
+def create_transactions_bulk(db: Session, rows: List[Dict[str, Any]]) -> List[Transaction]:
+    """
+    Create many ledger transactions with one commit.
+    
+    Rows go out as a multi-row INSERT (SQLAlchemy splits it into statements
+    of up to 1000 rows) and the running balances are updated by one upsert,
+    instead of a round-trip and commit per row. Like create_transaction,
+    this does not check balances for debits.
+    
+    Args:
+        db: Database session
+        rows: Dicts with user_id, amount and reason, and optionally
+            stripe_ref, category and metadata
+        
+    Returns:
+        Created Transaction objects, in input order
+        
+    Raises:
+        ValueError: If any row has an invalid reason or a zero amount
+    """
+    for row in rows:
+        if row["reason"] not in ["earn", "spend", "redeem"]:
+            raise ValueError(f"Invalid transaction reason: {row['reason']}")
+        if row["amount"] == 0:
+            raise ValueError("Transaction amount cannot be zero")
+    
+    if not rows:
+        return []
+    
+    created_at = datetime.utcnow()
+    values = [
+        {
+            "transaction_id": uuid.uuid4(),
+            "user_id": row["user_id"],
+            "amount": row["amount"],
+            "reason": row["reason"],
+            "stripe_ref": row.get("stripe_ref"),
+            "category": row.get("category"),
+            "meta": row.get("metadata") or None,
+            "created_at": created_at,
+        }
+        for row in rows
+    ]
+    
+    _apply_to_balances(db, [(v["user_id"], v["amount"], created_at) for v in values])
+    db.execute(insert(Transaction), values)
+    db.commit()
+    
+    logger.info("transactions_created_bulk", count=len(values))
+    
+    # Every column was set client-side, so no RETURNING round-trip is needed
+    return [Transaction(**v) for v in values]
+
+
+def create_debit_transaction(
+    db: Session,
+    user_id: UUID,
+    amount: Decimal,
+    reason: str,
+    stripe_ref: Optional[str] = None,
+    category: Optional[str] = None,
+    metadata: Optional[dict] = None,
+) -> Optional[Transaction]:
+    """
+    Debit a user's balance and record the ledger entry in one statement.
+    
+    A data-modifying CTE decrements user_balances only if the balance covers
+    the amount, and the ledger INSERT selects from it, so the check and the
+    debit are atomic and concurrent debits cannot overdraw the balance.
+    
+    Args:
+        db: Database session
+        user_id: User UUID
+        amount: Amount to debit (positive; stored as a negative ledger entry)
+        reason: Transaction reason ('spend', 'redeem')
+        stripe_ref: Optional Stripe transaction reference
+        category: Optional item category
+        metadata: Optional additional metadata as dict
+        
+    Returns:
+        Created Transaction object, or None if the balance is insufficient
+        
+    Raises:
+        ValueError: If reason is not a debit or amount is not positive
+    """
+    if reason not in ["spend", "redeem"]:
+        raise ValueError(f"Invalid debit reason: {reason}")
+    
+    if amount <= 0:
+        raise ValueError("Debit amount must be positive")
+    
+    transaction = Transaction(
+        transaction_id=uuid.uuid4(),
+        user_id=user_id,
+        amount=-amount,
+        reason=reason,
+        stripe_ref=stripe_ref,
+        category=category,
+        meta=metadata or None,
+        created_at=datetime.utcnow(),
+    )
+    
+    inserted = db.execute(_DEBIT_STMT, {
+        "p_transaction_id": transaction.transaction_id,
+        "p_user_id": user_id,
+        "p_amount": amount,
+        "p_entry_amount": -amount,
+        "p_reason": reason,
+        "p_stripe_ref": stripe_ref,
+        "p_category": category,
+        "p_metadata": transaction.meta,
+        "p_created_at": transaction.created_at,
+    }).scalar_one_or_none()
+    if inserted is None:
+        db.rollback()
+        logger.info("debit_rejected_insufficient_balance", user_id=str(user_id), amount=float(amount))
+        return None
+    
+    db.commit()
+    
+    logger.info(
+        "transaction_created",
+        transaction_id=str(transaction.transaction_id),
+        user_id=str(user_id),
+        amount=float(-amount),
+        reason=reason,
+        stripe_ref=stripe_ref,
+    )
+    
+    return transaction
+
+
+def encode_cursor(transaction: Transaction) -> str:
+    """
+    Build an opaque pagination cursor pointing just past a transaction.
+    
+    Args:
+        transaction: Last transaction of the current page
+        
+    Returns:
+        URL-safe base64 cursor string
+    """
+    raw = f"{transaction.created_at.isoformat()}|{transaction.transaction_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """
+    Decode a cursor produced by encode_cursor.
+    
+    Args:
+        cursor: Cursor string
+        
+    Returns:
+        Tuple of (created_at, transaction_id)
+        
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        created_at, transaction_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), UUID(transaction_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def get_transaction_page(
     db: Session,
     user_id: UUID,
     limit: int = 100,
     offset: int = 0,
-) -> List[Transaction]:
+    before: Optional[Tuple[datetime, UUID]] = None,
+) -> Tuple[List[Transaction], Optional[int]]:
     """
-    Get transaction history for a user.
+    Get a page of transaction history plus the user's total transaction count.
+    
+    Pass the (created_at, transaction_id) of the previous page's last row as
+    `before` for keyset pagination, which stays O(limit) at any depth; offset
+    is kept for existing callers. The total is an uncorrelated scalar
+    subquery on the same statement, so a page costs a single round-trip;
+    keyset pages don't count the whole history and report None.
     
     Args:
         db: Database session
         user_id: User UUID
         limit: Maximum number of transactions to return
         offset: Offset for pagination
+        before: Optional keyset cursor; only older transactions are returned
         
     Returns:
-        List of Transaction objects, ordered by created_at descending
+        Tuple of (transactions ordered newest first, total count or None).
+        Relationships are not loaded; accessing one raises instead of
+        issuing a lazy SELECT per row.
     """
-    transactions = db.query(Transaction).filter(
+    if before is None:
+        total_count = db.query(func.count(Transaction.transaction_id)).filter(
+            Transaction.user_id == user_id
+        ).scalar_subquery()
+        query = db.query(Transaction, total_count.label("total"))
+    else:
+        # Cursor pages skip the per-user COUNT(*); the first page reported it
+        query = db.query(Transaction).filter(
+            tuple_(Transaction.created_at, Transaction.transaction_id) < tuple_(*before)
+        )
+    
+    rows = query.options(
+        raiseload("*")
+    ).filter(
         Transaction.user_id == user_id
     ).order_by(
-        desc(Transaction.created_at)
+        desc(Transaction.created_at),
+        desc(Transaction.transaction_id),
     ).limit(limit).offset(offset).all()
     
+    if before is not None:
+        transactions = rows
+        total = None
+    else:
+        transactions = [row.Transaction for row in rows]
+        if rows:
+            total = rows[0].total
+        elif offset:
+            # Paged past the end: there is no row to carry the count
+            total = db.query(func.count(Transaction.transaction_id)).filter(
+                Transaction.user_id == user_id
+            ).scalar()
+        else:
+            total = 0
+    
     logger.info(
         "transaction_history_retrieved",
         user_id=str(user_id),
         count=len(transactions),
+        total=total,
         limit=limit,
         offset=offset,
+        keyset=before is not None,
     )
     
+    return transactions, total
+
+
+def get_transaction_history(
+    db: Session,
+    user_id: UUID,
+    limit: int = 100,
+    offset: int = 0,
+    before: Optional[Tuple[datetime, UUID]] = None,
+) -> List[Transaction]:
+    """
+    Get transaction history for a user.
+    
+    Args:
+        db: Database session
+        user_id: User UUID
+        limit: Maximum number of transactions to return
+        offset: Offset for pagination
+        before: Optional keyset cursor (created_at, transaction_id)
+        
+    Returns:
+        List of Transaction objects, ordered by created_at descending
+    """
+    transactions, _ = get_transaction_page(db, user_id, limit, offset, before)
     return transactions
 
 
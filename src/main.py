@@ -7,14 +7,29 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
-if __name__ == "__main__":
+
+def main():
+    """Run the API under uvicorn with the uvloop event loop and httptools parser"""
     port = int(os.getenv("PORT", 8000))
     host = os.getenv("HOST", "0.0.0.0")
-    
+    reload = os.getenv("DEBUG", "false").lower() == "true"
+
+    # Reload mode only supports a single worker
+    default_workers = 1 if reload else 2 * (os.cpu_count() or 1) + 1
+    workers = int(os.getenv("WORKERS", default_workers))
+    # Workers size their DB pools from this (see src/db/connection.py)
+    os.environ["WORKERS"] = str(workers)
+
     uvicorn.run(
         "src.api.routes:app",
         host=host,
         port=port,
-        reload=os.getenv("DEBUG", "false").lower() == "true",
+        reload=reload,
+        workers=workers,
+        loop="uvloop",
+        http="httptools",
     )
 
+
+if __name__ == "__main__":
+    main()
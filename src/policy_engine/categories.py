@@ -1,7 +1,7 @@
 """SNAP-eligible and ineligible categories"""
 
 # Allowed categories (SNAP-eligible)
-ALLOWED_CATEGORIES = {
+ALLOWED_CATEGORIES = frozenset({
     # Food & Groceries
     "groceries",
     "food",
@@ -28,10 +28,10 @@ ALLOWED_CATEGORIES = {
     "medical_supplies",
     "baby_formula",
     "baby_food",
-}
+})
 
 # Disallowed categories (NOT SNAP-eligible)
-DISALLOWED_CATEGORIES = {
+DISALLOWED_CATEGORIES = frozenset({
     # Alcohol & Tobacco
     "alcohol",
     "beer",
@@ -62,7 +62,10 @@ DISALLOWED_CATEGORIES = {
     "clothing",
     "electronics",
     "appliances",
-}
+})
+
+# Every category the classifier recognizes
+KNOWN_CATEGORIES = ALLOWED_CATEGORIES | DISALLOWED_CATEGORIES
 
 # UPC/SKU patterns for classification
 # These are example patterns - in production, use a comprehensive database
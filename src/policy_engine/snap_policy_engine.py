@@ -20,6 +20,9 @@ class PolicyDecision(Enum):
 
 class Item:
     """Represents an item in a transaction"""
+    # Built per cart line; slots drop the per-instance __dict__
+    __slots__ = ("upc", "sku", "product_name", "category", "price", "quantity", "is_eligible")
+    
     def __init__(
         self,
         upc: Optional[str] = None,
@@ -89,12 +92,10 @@ class PolicyEngine:
         Returns:
             Tuple of (decision: PolicyDecision, processed_items: List[Item], approved_amount: Decimal)
         """
-        processed_items = []
-        approved_amount = Decimal("0.00")
-        denied_items = []
-        
-        for item_data in items:
-            item = Item(
+        # Carts are small and every caller needs the Item objects, so this
+        # stays a single pass; classification of repeated names is memoized
+        processed_items = [
+            Item(
                 upc=item_data.get("upc"),
                 sku=item_data.get("sku"),
                 product_name=item_data.get("product_name"),
@@ -102,18 +103,20 @@ class PolicyEngine:
                 price=Decimal(str(item_data.get("price", 0))),
                 quantity=int(item_data.get("quantity", 1)),
             )
-            
-            processed_items.append(item)
-            
-            if item.is_eligible:
-                approved_amount += item.price * item.quantity
-            else:
-                denied_items.append(item)
+            for item_data in items
+        ]
+        
+        eligible_items = [item for item in processed_items if item.is_eligible]
+        approved_amount = sum(
+            (item.price * item.quantity for item in eligible_items),
+            Decimal("0.00"),
+        )
+        denied_count = len(processed_items) - len(eligible_items)
         
         # Determine decision
-        if len(denied_items) == 0:
+        if denied_count == 0:
             decision = PolicyDecision.APPROVE
-        elif len(denied_items) == len(processed_items):
+        elif denied_count == len(processed_items):
             decision = PolicyDecision.DENY
         else:
             decision = PolicyDecision.PARTIAL
@@ -121,8 +124,8 @@ class PolicyEngine:
         logger.info(
             "transaction_eligibility_checked",
             total_items=len(processed_items),
-            approved_items=len(processed_items) - len(denied_items),
-            denied_items=len(denied_items),
+            approved_items=len(processed_items) - denied_count,
+            denied_items=denied_count,
             approved_amount=float(approved_amount),
             decision=decision.value,
         )
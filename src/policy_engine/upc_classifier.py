@@ -1,9 +1,13 @@
 """UPC/SKU classification for item eligibility"""
 
-from typing import Optional, Dict, List
+import re
+import threading
+from functools import lru_cache
+from typing import Optional, List, Pattern, Tuple
+from cachetools import LRUCache
 import structlog
 
-from .categories import ALLOWED_CATEGORIES, DISALLOWED_CATEGORIES, UPC_PATTERNS
+from .categories import ALLOWED_CATEGORIES, KNOWN_CATEGORIES, UPC_PATTERNS
 
 logger = structlog.get_logger()
 
@@ -12,8 +16,29 @@ class UPCClassifier:
     """Classifies items by UPC/SKU to determine SNAP eligibility"""
     
     def __init__(self):
-        # In production, this would load from a database or external service
-        self.category_cache: Dict[str, str] = {}
+        # In production, this would load from a database or external service.
+        # Bounded, since identifiers come from request payloads; shared by
+        # threadpool workers, hence the lock.
+        self.category_cache: LRUCache = LRUCache(maxsize=100_000)
+        self._category_cache_lock = threading.Lock()
+        
+        # One compiled alternation per category, in UPC_PATTERNS priority order,
+        # so a product name is scanned once per category rather than per pattern
+        self._matchers: List[Tuple[str, Pattern[str]]] = [
+            (cat, re.compile("|".join(map(re.escape, patterns))))
+            for cat, patterns in UPC_PATTERNS.items()
+        ]
+        
+        # Product names repeat across carts; lowercase and scan each one once
+        self._match_product_name = lru_cache(maxsize=4096)(self._scan_product_name)
+    
+    def _scan_product_name(self, product_name: str) -> Optional[str]:
+        """Return the first category whose patterns occur in the product name"""
+        product_lower = product_name.lower()
+        for pattern_cat, matcher in self._matchers:
+            if matcher.search(product_lower):
+                return pattern_cat
+        return None
     
     def classify_item(
         self,
@@ -35,31 +60,33 @@ class UPCClassifier:
             Category string (e.g., 'groceries', 'alcohol', 'hot_food')
         """
         # If category is provided and valid, use it
-        if category and category in (ALLOWED_CATEGORIES | DISALLOWED_CATEGORIES):
+        if category in KNOWN_CATEGORIES:
             return category
         
         # Check UPC/SKU cache
         identifier = upc or sku
-        if identifier and identifier in self.category_cache:
-            return self.category_cache[identifier]
+        if identifier:
+            with self._category_cache_lock:
+                cached = self.category_cache.get(identifier)
+            if cached is not None:
+                return cached
         
         # Classify based on product name patterns
         if product_name:
-            product_lower = product_name.lower()
-            
             # Check for disallowed patterns first (more restrictive)
-            for disallowed_cat, patterns in UPC_PATTERNS.items():
-                for pattern in patterns:
-                    if pattern in product_lower:
-                        logger.info(
-                            "item_classified",
-                            identifier=identifier,
-                            category=disallowed_cat,
-                            method="pattern_match",
-                        )
-                        if identifier:
-                            self.category_cache[identifier] = disallowed_cat
-                        return disallowed_cat
+            disallowed_cat = self._match_product_name(product_name)
+            if disallowed_cat:
+                # Per item, so debug; the cart summary is logged at info
+                logger.debug(
+                    "item_classified",
+                    identifier=identifier,
+                    category=disallowed_cat,
+                    method="pattern_match",
+                )
+                if identifier:
+                    with self._category_cache_lock:
+                        self.category_cache[identifier] = disallowed_cat
+                return disallowed_cat
         
         # Default to unknown if we can't classify
         logger.warning(
@@ -80,12 +107,9 @@ class UPCClassifier:
         Returns:
             True if eligible, False otherwise
         """
-        if category in ALLOWED_CATEGORIES:
-            return True
-        if category in DISALLOWED_CATEGORIES:
-            return False
-        # Unknown categories are default-deny
-        return False
+        # Disallowed and unknown categories are both denied (default-deny),
+        # so a single membership test decides
+        return category in ALLOWED_CATEGORIES
 
 
 # Global classifier instance
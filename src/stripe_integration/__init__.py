@@ -5,15 +5,21 @@ from .connect import (
     get_stripe_account,
     update_stripe_balance,
     authorize_transaction,
+    cancel_authorization,
 )
 
-from .webhooks import handle_stripe_webhook
+from .webhooks import handle_stripe_webhook, process_stripe_event
+from .idempotency import IdempotencyStore, idempotency_store
 
 __all__ = [
     "create_stripe_account",
     "get_stripe_account",
     "update_stripe_balance",
     "authorize_transaction",
+    "cancel_authorization",
     "handle_stripe_webhook",
+    "process_stripe_event",
+    "IdempotencyStore",
+    "idempotency_store",
 ]
 
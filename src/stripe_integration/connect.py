@@ -19,6 +19,11 @@ stripe.api_key = os.getenv("STRIPE_SECRET_KEY", "")
 if not stripe.api_key:
     logger.warning("stripe_api_key_missing")
 
+# The SDK already keeps HTTPS connections alive (one requests.Session per
+# thread); let it retry connection errors and 409/5xx. It attaches an
+# idempotency key to retried POSTs, so a retry cannot charge twice.
+stripe.max_network_retries = int(os.getenv("STRIPE_MAX_NETWORK_RETRIES", "2"))
+
 
 def create_stripe_account(
     db: Session,
@@ -234,3 +239,22 @@ def authorize_transaction(
         logger.error("stripe_authorization_failed", error=str(e))
         return False, None
 
+
+def cancel_authorization(payment_intent_id: str) -> bool:
+    """
+    Cancel a payment intent that was authorized but never recorded in the ledger.
+    
+    Args:
+        payment_intent_id: Stripe payment intent ID
+        
+    Returns:
+        True if cancelled, False if the Stripe API call failed
+    """
+    try:
+        stripe.PaymentIntent.cancel(payment_intent_id)
+        logger.info("stripe_authorization_cancelled", payment_intent_id=payment_intent_id)
+        return True
+        
+    except stripe.error.StripeError as e:
+        logger.error("stripe_authorization_cancel_failed", payment_intent_id=payment_intent_id, error=str(e))
+        return False
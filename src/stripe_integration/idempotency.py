@@ -0,0 +1,135 @@
+"""Idempotency store for Stripe webhook events"""
+
+import os
+import threading
+from abc import ABC, abstractmethod
+import time
+from typing import Any, Dict, Optional
+import orjson
+from cachetools import TTLCache
+
+# memory: per-process, bounded; redis: shared across workers and instances
+IDEMPOTENCY_BACKEND = os.getenv("IDEMPOTENCY_BACKEND", "memory")
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "86400"))
+# Lease on a claim still being processed; must outlast the slowest event.
+# A worker that dies mid-event only blocks Stripe's retries this long.
+IDEMPOTENCY_PENDING_TTL = int(os.getenv("IDEMPOTENCY_PENDING_TTL", "60"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+class IdempotencyStore(ABC):
+    """
+    Tracks which webhook events have been claimed and what they returned.
+
+    begin() atomically claims an event for a short lease. The claimer
+    either complete()s it, recording the response replays should get and
+    keeping it for the full TTL, or release()s it on failure so Stripe's
+    retry can be processed. A claim that is neither lapses with its lease.
+    """
+
+    @abstractmethod
+    def begin(self, event_id: str) -> bool:
+        """Claim an event; False if it is completed or its lease is still held"""
+
+    @abstractmethod
+    def complete(self, event_id: str, response: Dict[str, Any]) -> None:
+        """Record the response for a claimed event"""
+
+    @abstractmethod
+    def release(self, event_id: str) -> None:
+        """Drop a claim so the event can be processed again"""
+
+    @abstractmethod
+    def get_response(self, event_id: str) -> Optional[Dict[str, Any]]:
+        """Response of a completed event, or None if unknown or in flight"""
+
+
+class MemoryIdempotencyStore(IdempotencyStore):
+    """
+    In-process store; entries expire after the TTL and the size is capped.
+
+    A pending claim is stored as its lease deadline (a float), a completed
+    one as its response dict.
+    """
+
+    def __init__(
+        self,
+        ttl: int = IDEMPOTENCY_TTL,
+        pending_ttl: float = IDEMPOTENCY_PENDING_TTL,
+        maxsize: int = 100_000,
+    ):
+        self._events: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._pending_ttl = pending_ttl
+        self._lock = threading.Lock()
+
+    def begin(self, event_id: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._events.get(event_id)
+            if entry is not None and not (isinstance(entry, float) and entry <= now):
+                return False
+            self._events[event_id] = now + self._pending_ttl
+            return True
+
+    def complete(self, event_id: str, response: Dict[str, Any]) -> None:
+        with self._lock:
+            self._events[event_id] = response
+
+    def release(self, event_id: str) -> None:
+        with self._lock:
+            self._events.pop(event_id, None)
+
+    def get_response(self, event_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            response = self._events.get(event_id)
+        return None if isinstance(response, float) else response
+
+
+class RedisIdempotencyStore(IdempotencyStore):
+    """Redis-backed store shared by every worker; claims use SET NX EX"""
+
+    def __init__(self, client, ttl: int = IDEMPOTENCY_TTL, pending_ttl: int = IDEMPOTENCY_PENDING_TTL):
+        self._redis = client
+        self._ttl = ttl
+        self._pending_ttl = pending_ttl
+
+    @staticmethod
+    def _key(event_id: str) -> str:
+        return f"stripe:evt:{event_id}"
+
+    def begin(self, event_id: str) -> bool:
+        return bool(self._redis.set(self._key(event_id), "1", nx=True, ex=self._pending_ttl))
+
+    def complete(self, event_id: str, response: Dict[str, Any]) -> None:
+        # Response first, so a claim kept for the full TTL always has one
+        self._redis.set(f"{self._key(event_id)}:resp", orjson.dumps(response), ex=self._ttl)
+        self._redis.set(self._key(event_id), "1", ex=self._ttl)
+
+    def release(self, event_id: str) -> None:
+        self._redis.delete(self._key(event_id))
+
+    def get_response(self, event_id: str) -> Optional[Dict[str, Any]]:
+        raw = self._redis.get(f"{self._key(event_id)}:resp")
+        return orjson.loads(raw) if raw else None
+
+
+def create_idempotency_store(backend: str = IDEMPOTENCY_BACKEND) -> IdempotencyStore:
+    """
+    Build the store selected by IDEMPOTENCY_BACKEND.
+
+    Raises:
+        ValueError: If the backend is unknown
+        ImportError: If the redis backend is selected but redis is not installed
+    """
+    if backend == "memory":
+        return MemoryIdempotencyStore()
+    if backend == "redis":
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("IDEMPOTENCY_BACKEND=redis requires the 'redis' package") from e
+        return RedisIdempotencyStore(redis.Redis.from_url(REDIS_URL))
+    raise ValueError(f"Unknown IDEMPOTENCY_BACKEND: {backend}")
+
+
+# Global idempotency store
+idempotency_store = create_idempotency_store()
@@ -3,24 +3,27 @@
 import os
 import stripe
 import json
-from typing import Dict, Any, Optional
+import orjson
+from typing import Callable, Dict, Any, Optional
 from decimal import Decimal
 from uuid import UUID
+from sqlalchemy import exists, select
 from sqlalchemy.orm import Session
+from fastapi import HTTPException
 import structlog
 
 from ..db.models import Transaction, StripeAccount
 from ..ledger.transactions import create_transaction
 from ..audit.audit_log import log_webhook_event
+from .idempotency import idempotency_store
 
 logger = structlog.get_logger()
 
 # Get webhook secret
 WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET", "")
 
-# Track processed events for idempotency
-processed_events: Dict[str, bool] = {}
-
+# Seconds a signature timestamp may lag behind; same as stripe's default
+WEBHOOK_TOLERANCE = 300
 
 def handle_stripe_webhook(
     db: Session,
@@ -42,6 +45,7 @@ def handle_stripe_webhook(
         
     Raises:
         ValueError: If signature is invalid
+        HTTPException: 409 if another delivery of the event is still in flight
         Exception: If webhook processing fails
     """
     if not WEBHOOK_SECRET:
@@ -49,53 +53,46 @@ def handle_stripe_webhook(
         raise ValueError("Stripe webhook secret not configured")
     
     try:
-        # Verify webhook signature
-        event = stripe.Webhook.construct_event(
-            payload,
+        # Verify the signature, then parse the payload into a plain dict;
+        # construct_event would also build a nested stripe.Event we never use
+        stripe.WebhookSignature.verify_header(
+            payload.decode("utf-8"),
             signature,
             WEBHOOK_SECRET,
+            tolerance=WEBHOOK_TOLERANCE,
         )
+        event = orjson.loads(payload)
         
         event_id = event.get("id")
         event_type = event.get("type")
         
-        # Check idempotency
-        if event_id in processed_events:
+        # Claim the event; replays get the first delivery's response
+        if not idempotency_store.begin(event_id):
+            response = idempotency_store.get_response(event_id)
+            if response is None:
+                # Not applied yet; a non-2xx makes Stripe retry once the lease
+                # is completed, released or lapses
+                logger.info("webhook_in_flight", event_id=event_id)
+                raise HTTPException(status_code=409, detail="Event is still being processed")
             logger.info("webhook_already_processed", event_id=event_id)
-            return {"status": "already_processed", "event_id": event_id}
-        
-        # Log webhook event
-        log_webhook_event(
-            db,
-            user_id=None,  # Will be extracted from event if available
-            event_type=event_type,
-            details={
-                "event_id": event_id,
-                "type": event_type,
-                "data": event.get("data", {}),
-            },
-            ip_address=ip_address,
-        )
+            return response
         
-        # Process event based on type
-        if event_type == "payment_intent.succeeded":
-            _handle_payment_succeeded(db, event)
-        elif event_type == "payment_intent.payment_failed":
-            _handle_payment_failed(db, event)
-        elif event_type == "transfer.created":
-            _handle_transfer_created(db, event)
-        elif event_type == "account.updated":
-            _handle_account_updated(db, event)
-        else:
-            logger.info("webhook_event_ignored", event_type=event_type)
+        try:
+            process_stripe_event(db, event, ip_address=ip_address)
+        except Exception:
+            # Let Stripe's retry process the event
+            idempotency_store.release(event_id)
+            raise
         
-        # Mark as processed
-        processed_events[event_id] = True
+        response = {"status": "success", "event_id": event_id}
+        idempotency_store.complete(event_id, response)
         
         logger.info("webhook_processed", event_id=event_id, event_type=event_type)
         
-        return {"status": "success", "event_id": event_id}
+        return response
         
+    except HTTPException:
+        raise
     except ValueError as e:
         logger.error("webhook_signature_invalid", error=str(e))
         raise
@@ -107,26 +104,111 @@ def handle_stripe_webhook(
         raise
 
 
-def _handle_payment_succeeded(db: Session, event: Dict[str, Any]):
-    """Handle payment_intent.succeeded event"""
+def process_stripe_event(
+    db: Session,
+    event: Dict[str, Any],
+    ip_address: Optional[str] = None,
+) -> None:
+    """
+    Audit and apply a verified, claimed Stripe event.
+    
+    Kept separate from signature verification and idempotency so a queue
+    worker can run it with the same semantics as the inline path.
+    
+    Args:
+        db: Database session
+        event: Verified Stripe event
+        ip_address: Optional IP address of the delivery
+    """
+    event_type = event.get("type")
+    
+    # Log webhook event
+    log_webhook_event(
+        db,
+        user_id=None,  # Will be extracted from event if available
+        event_type=event_type,
+        details={
+            "event_id": event.get("id"),
+            "type": event_type,
+            "data": event.get("data", {}),
+        },
+        ip_address=ip_address,
+    )
+    
+    # Process event based on type
+    handler = _EVENT_HANDLERS.get(event_type)
+    if handler is None:
+        logger.info("webhook_event_ignored", event_type=event_type)
+        return
+    handler(db, event)
+
+
+def _stripe_ref_recorded(db: Session, stripe_ref: str) -> bool:
+    """
+    Whether the ledger already has a row for stripe_ref (idx_stripe_ref).
+    
+    Stripe may describe one state change in several events with distinct
+    IDs, and /spend records its PaymentIntent before payment_intent.succeeded
+    arrives, so the ref, not the event, identifies the ledger write.
+    """
+    return db.execute(select(exists().where(Transaction.stripe_ref == stripe_ref))).scalar()
+
+
+def _record_ledger_row(db: Session, event: Dict[str, Any], row: Optional[Dict[str, Any]]) -> None:
+    """Write a handler's ledger row unless its stripe_ref is already recorded"""
+    if not row:
+        return
+    if _stripe_ref_recorded(db, row["stripe_ref"]):
+        logger.info("webhook_deduped", event_id=event.get("id"), stripe_ref=row["stripe_ref"])
+        return
+    create_transaction(db, **row)
+
+
+def _payment_succeeded_row(event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Ledger row for a payment_intent.succeeded event, or None if it has no user"""
     payment_intent = event["data"]["object"]
     metadata = payment_intent.get("metadata", {})
     user_id = metadata.get("user_id")
     
     if not user_id:
         logger.warning("payment_succeeded_no_user_id", payment_intent_id=payment_intent.get("id"))
-        return
+        return None
     
-    # Create transaction record
     amount = Decimal(payment_intent["amount"]) / 100  # Convert from cents
-    create_transaction(
-        db,
-        user_id=UUID(user_id),
-        amount=-amount,  # Negative for spend
-        reason="spend",
-        stripe_ref=payment_intent["id"],
-        metadata={"event_type": "payment_intent.succeeded"},
-    )
+    return {
+        "user_id": UUID(user_id),
+        "amount": -amount,  # Negative for spend
+        "reason": "spend",
+        "stripe_ref": payment_intent["id"],
+        "metadata": {"event_type": "payment_intent.succeeded"},
+    }
+
+
+def _transfer_created_row(db: Session, event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Ledger row for a transfer.created event, or None if the destination is unknown"""
+    transfer = event["data"]["object"]
+    # Index-only lookup on ix_stripe_accounts_acct_id
+    user_id = db.execute(
+        select(StripeAccount.user_id)
+        .where(StripeAccount.stripe_account_id == transfer.get("destination"))
+    ).scalar_one_or_none()
+    
+    if not user_id:
+        return None
+    
+    amount = Decimal(transfer["amount"]) / 100
+    return {
+        "user_id": user_id,
+        "amount": amount,  # Positive for earn
+        "reason": "earn",
+        "stripe_ref": transfer["id"],
+        "metadata": {"event_type": "transfer.created"},
+    }
+
+
+def _handle_payment_succeeded(db: Session, event: Dict[str, Any]):
+    """Handle payment_intent.succeeded event"""
+    _record_ledger_row(db, event, _payment_succeeded_row(event))
 
 
 def _handle_payment_failed(db: Session, event: Dict[str, Any]):
@@ -137,24 +219,7 @@ def _handle_payment_failed(db: Session, event: Dict[str, Any]):
 
 def _handle_transfer_created(db: Session, event: Dict[str, Any]):
     """Handle transfer.created event"""
-    transfer = event["data"]["object"]
-    destination = transfer.get("destination")
-    
-    # Find user by Stripe account ID
-    stripe_account = db.query(StripeAccount).filter(
-        StripeAccount.stripe_account_id == destination
-    ).first()
-    
-    if stripe_account:
-        amount = Decimal(transfer["amount"]) / 100
-        create_transaction(
-            db,
-            user_id=stripe_account.user_id,
-            amount=amount,  # Positive for earn
-            reason="earn",
-            stripe_ref=transfer["id"],
-            metadata={"event_type": "transfer.created"},
-        )
+    _record_ledger_row(db, event, _transfer_created_row(db, event))
 
 
 def _handle_account_updated(db: Session, event: Dict[str, Any]):
@@ -162,3 +227,11 @@ def _handle_account_updated(db: Session, event: Dict[str, Any]):
     account = event["data"]["object"]
     logger.info("stripe_account_updated", account_id=account.get("id"))
 
+
+# Event type -> handler, for process_stripe_event
+_EVENT_HANDLERS: Dict[str, Callable[[Session, Dict[str, Any]], None]] = {
+    "payment_intent.succeeded": _handle_payment_succeeded,
+    "payment_intent.payment_failed": _handle_payment_failed,
+    "transfer.created": _handle_transfer_created,
+    "account.updated": _handle_account_updated,
+}
@@ -2,6 +2,7 @@
 
 import pytest
 from decimal import Decimal
+from unittest.mock import patch
 from src.ledger.transactions import create_transaction
 
 
@@ -35,6 +36,15 @@ def test_get_balance(authenticated_client, db_session, test_user):
     assert Decimal(data["balance"]) == Decimal("10.00")
 
 
+def test_api_request_audit_uses_test_database(authenticated_client, db_session):
+    """Test that the background API audit row is written through the session dependency"""
+    from src.db.models import AuditLog
+    response = authenticated_client.get("/balance")
+    assert response.status_code == 200
+    
+    assert db_session.query(AuditLog).filter(AuditLog.action == "api_request").count() == 1
+
+
 def test_earn_rewards(authenticated_client, db_session):
     """Test earning rewards"""
     response = authenticated_client.post(
@@ -142,3 +152,56 @@ def test_get_transactions(authenticated_client, db_session, test_user):
     data = response.json()
     assert len(data["transactions"]) == 3
 
+
+def test_get_transactions_cursor_pages(authenticated_client, db_session, mock_jwt_token):
+    """Test following next_cursor through /transactions"""
+    from uuid import UUID
+    from src.api.routes import get_user_from_db
+    user = get_user_from_db(db_session, UUID(mock_jwt_token["user_id"]))
+    for i in range(3):
+        create_transaction(db_session, user.user_id, Decimal(f"{i+1}.00"), "earn")
+    
+    first = authenticated_client.get("/transactions?limit=2").json()
+    assert [t["amount"] for t in first["transactions"]] == ["3.00", "2.00"]
+    assert first["total"] == 3
+    assert first["next_cursor"]
+    
+    second = authenticated_client.get(f"/transactions?limit=2&before={first['next_cursor']}").json()
+    assert [t["amount"] for t in second["transactions"]] == ["1.00"]
+    assert second["total"] is None
+    assert second["next_cursor"] is None
+    
+    response = authenticated_client.get("/transactions?limit=0")
+    assert response.status_code == 200
+    assert response.json()["next_cursor"] is None
+    
+    assert authenticated_client.get("/transactions?before=not-a-cursor").status_code == 400
+
+
+@patch('src.api.routes.cancel_authorization')
+@patch('src.api.routes.create_debit_transaction', return_value=None)
+@patch('src.api.routes.authorize_transaction', return_value=(True, "pi_race_test"))
+@patch('src.api.routes.get_stripe_account')
+def test_spend_cancels_authorization_when_debit_fails(
+    mock_get_account, mock_authorize, mock_debit, mock_cancel,
+    authenticated_client, db_session, mock_jwt_token,
+):
+    """Test that the Stripe hold is released if the balance is spent after the pre-check"""
+    from uuid import UUID
+    from src.api.routes import get_user_from_db
+    user = get_user_from_db(db_session, UUID(mock_jwt_token["user_id"]))
+    create_transaction(db_session, user.user_id, Decimal("20.00"), "earn")
+    
+    response = authenticated_client.post(
+        "/spend",
+        params={"amount": "8.00"},
+        json=[
+            {"product_name": "Milk", "category": "groceries", "price": "5.00", "quantity": 1},
+            {"product_name": "Bread", "category": "groceries", "price": "3.00", "quantity": 1},
+        ],
+    )
+    
+    assert response.status_code == 400
+    assert "Insufficient balance" in response.json()["detail"]
+    mock_debit.assert_called_once()
+    mock_cancel.assert_called_once_with("pi_race_test")
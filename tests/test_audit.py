@@ -0,0 +1,92 @@
+"""Tests for audit logging"""
+
+import asyncio
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+from src.audit.queue import AuditWriter
+from src.db.models import AuditLog
+
+
+def _row(event_type: str = "earn") -> dict:
+    return {
+        "log_id": uuid.uuid4(),
+        "user_id_hash": "system",
+        "action": "transaction",
+        "event_type": event_type,
+        "details": {"amount": "1.00"},
+        "created_at": datetime.utcnow(),
+    }
+
+
+@pytest.fixture
+def session_factory(db_session):
+    """Session factory for the writer that commits on the test session"""
+    @contextmanager
+    def factory():
+        yield db_session
+        db_session.commit()
+    return factory
+
+
+async def test_audit_writer_stop_flushes_pending_batch(db_session, session_factory):
+    """Test that rows already taken into a batch are written on stop"""
+    writer = AuditWriter(batch_size=100, interval_ms=60_000, session_factory=session_factory)
+    writer.start()
+    for _ in range(5):
+        assert writer.submit(_row())
+    
+    # Let the drainer pull the rows into its batch and wait for more
+    await asyncio.sleep(0.05)
+    await writer.stop()
+    
+    assert db_session.query(AuditLog).count() == 5
+    assert not writer.running
+
+
+async def test_audit_writer_retries_failed_flush(db_session, session_factory):
+    """Test that a failed flush keeps its rows and retries them"""
+    calls = []
+    committed = threading.Event()
+    
+    @contextmanager
+    def flaky_factory():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("database unavailable")
+        with session_factory() as session:
+            yield session
+        committed.set()
+    
+    writer = AuditWriter(batch_size=100, interval_ms=10, session_factory=flaky_factory)
+    writer.start()
+    for _ in range(3):
+        writer.submit(_row())
+    
+    # The flush runs in an executor thread on db_session; don't touch the
+    # session from here until the writer is done with it
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        if committed.is_set():
+            break
+    await writer.stop()
+    
+    assert len(calls) >= 2
+    assert db_session.query(AuditLog).count() == 3
+
+
+async def test_audit_writer_declines_when_queue_full(db_session, session_factory):
+    """Test that submit() hands rows back to the caller once the queue is full"""
+    writer = AuditWriter(batch_size=100, interval_ms=60_000, session_factory=session_factory, queue_max=2)
+    writer.start()
+    
+    # The drainer hasn't run yet, so nothing leaves the queue in between
+    assert writer.submit(_row())
+    assert writer.submit(_row())
+    assert not writer.submit(_row())
+    
+    await writer.stop()
+    assert db_session.query(AuditLog).count() == 2
@@ -0,0 +1,76 @@
+"""Tests for JWT verification"""
+
+import hashlib
+import time
+import jwt
+import pytest
+from unittest.mock import patch
+from uuid import uuid4
+from fastapi import HTTPException
+from src.auth import jwt_verifier
+from src.auth.jwt_verifier import verify_jwt
+
+SECRET = "test-secret"
+
+
+@pytest.fixture(autouse=True)
+def hs256_verifier():
+    """Verify with a shared secret and start from an empty token cache"""
+    jwt_verifier._jwt_cache.clear()
+    with patch.object(jwt_verifier, "_VERIFICATION_KEY", SECRET), \
+            patch.object(jwt_verifier, "_JWT_ALGORITHMS", ["HS256"]):
+        yield
+    jwt_verifier._jwt_cache.clear()
+
+
+def _token(key: str = SECRET, **claims) -> str:
+    payload = {"user_id": str(uuid4()), "exp": int(time.time()) + 60}
+    payload.update(claims)
+    return jwt.encode(payload, key, algorithm="HS256")
+
+
+def _cache_key(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+def test_cached_token_skips_decode():
+    """Test that a repeat token is served from the cache"""
+    token = _token()
+    payload = verify_jwt(token)
+    
+    with patch.object(jwt_verifier.jwt, "decode", wraps=jwt.decode) as decode:
+        assert verify_jwt(token) == payload
+    
+    decode.assert_not_called()
+
+
+def test_expired_cached_token_rejected_and_evicted():
+    """Test that a cached token past its exp is re-verified and dropped"""
+    exp = int(time.time()) - 1
+    token = _token(exp=exp)
+    # Cached while still valid
+    jwt_verifier._jwt_cache[_cache_key(token)] = {"user_id": str(uuid4()), "exp": exp}
+    
+    with pytest.raises(HTTPException) as exc_info:
+        verify_jwt(token)
+    
+    assert exc_info.value.status_code == 401
+    assert _cache_key(token) not in jwt_verifier._jwt_cache
+
+
+_INVALID_TOKENS = {
+    "bad_signature": lambda: _token(key="wrong-secret"),
+    "expired": lambda: _token(exp=int(time.time()) - 1),
+    "no_user_id": lambda: jwt.encode({"sub": "no_user_id", "exp": int(time.time()) + 60}, SECRET, algorithm="HS256"),
+}
+
+
+@pytest.mark.parametrize("case", sorted(_INVALID_TOKENS))
+def test_invalid_token_not_cached(case):
+    """Test that tokens failing validation never enter the cache"""
+    token = _INVALID_TOKENS[case]()
+    with pytest.raises(HTTPException) as exc_info:
+        verify_jwt(token)
+    
+    assert exc_info.value.status_code == 401
+    assert len(jwt_verifier._jwt_cache) == 0
@@ -5,10 +5,18 @@ from decimal import Decimal
 from uuid import uuid4
 from src.ledger.transactions import (
     create_transaction,
+    create_debit_transaction,
+    create_transactions_bulk,
     get_user_balance,
+    get_user_balances_bulk,
     get_transaction_history,
+    get_transaction_page,
+    encode_cursor,
+    decode_cursor,
     calculate_balance_from_ledger,
 )
+from src.ledger.models import TransactionResponse
+from src.db.models import Transaction
 
 
 def test_create_transaction_earn(db_session, test_user):
@@ -49,6 +57,16 @@ def test_create_transaction_spend(db_session, test_user):
     assert txn.reason == "spend"
 
 
+def test_transaction_metadata_round_trip(db_session, test_user):
+    """Test that metadata is stored as JSON and returned as a dict"""
+    metadata = {"merchant_id": "m-1", "item_count": 2}
+    txn = create_transaction(db_session, test_user.user_id, Decimal("3.00"), "earn", metadata=metadata)
+    
+    stored = db_session.get(Transaction, txn.transaction_id)
+    assert stored.meta == metadata
+    assert TransactionResponse.model_validate(stored).metadata == metadata
+
+
 def test_get_user_balance(db_session, test_user):
     """Test balance calculation"""
     # Initial balance should be zero
@@ -69,6 +87,106 @@ def test_get_user_balance(db_session, test_user):
     assert balance == Decimal("12.00")
 
 
+def test_running_balance_matches_ledger(db_session, test_user):
+    """Test that the stored running balance agrees with the ledger sum"""
+    create_transaction(db_session, test_user.user_id, Decimal("7.25"), "earn")
+    create_transaction(db_session, test_user.user_id, Decimal("-2.10"), "spend")
+    create_transaction(db_session, test_user.user_id, Decimal("-1.00"), "redeem")
+    
+    balance = get_user_balance(db_session, test_user.user_id)
+    assert balance == Decimal("4.15")
+    assert balance == calculate_balance_from_ledger(db_session, test_user.user_id)
+
+
+def test_get_user_balances_bulk(db_session, test_user):
+    """Test reading several balances in one call"""
+    create_transaction(db_session, test_user.user_id, Decimal("12.00"), "earn")
+    create_transaction(db_session, test_user.user_id, Decimal("-2.00"), "spend")
+    unknown_user_id = uuid4()
+    
+    balances = get_user_balances_bulk(db_session, [test_user.user_id, unknown_user_id])
+    assert balances == {test_user.user_id: Decimal("10.00"), unknown_user_id: Decimal("0")}
+
+
+def test_balance_includes_residual_ledger_rows(db_session, test_user):
+    """Test that ledger rows newer than the running balance are still counted"""
+    create_transaction(db_session, test_user.user_id, Decimal("5.00"), "earn")
+    
+    # Written without going through create_transaction
+    db_session.add(Transaction(user_id=test_user.user_id, amount=Decimal("2.50"), reason="earn"))
+    db_session.commit()
+    
+    assert get_user_balance(db_session, test_user.user_id) == Decimal("7.50")
+
+
+def test_writes_fold_residual_ledger_rows(db_session, test_user):
+    """Test that writes after an out-of-band ledger row keep the balance equal to the ledger"""
+    create_transaction(db_session, test_user.user_id, Decimal("5.00"), "earn")
+    db_session.add(Transaction(user_id=test_user.user_id, amount=Decimal("2.50"), reason="earn"))
+    db_session.commit()
+    
+    create_transaction(db_session, test_user.user_id, Decimal("1.00"), "earn")
+    assert get_user_balance(db_session, test_user.user_id) == Decimal("8.50")
+    
+    # The debit check must see the out-of-band row too
+    db_session.add(Transaction(user_id=test_user.user_id, amount=Decimal("1.50"), reason="earn"))
+    db_session.commit()
+    assert create_debit_transaction(db_session, test_user.user_id, Decimal("9.50"), "spend") is not None
+    assert get_user_balance(db_session, test_user.user_id) == Decimal("0.50")
+    
+    db_session.add(Transaction(user_id=test_user.user_id, amount=Decimal("0.25"), reason="earn"))
+    db_session.commit()
+    create_transactions_bulk(db_session, [
+        {"user_id": test_user.user_id, "amount": Decimal("2.00"), "reason": "earn"},
+    ])
+    balance = get_user_balance(db_session, test_user.user_id)
+    assert balance == Decimal("2.75")
+    assert balance == calculate_balance_from_ledger(db_session, test_user.user_id)
+
+
+def test_first_balance_row_opens_from_ledger(db_session, test_user):
+    """Test that a user's first running balance includes ledger rows written before it"""
+    db_session.add(Transaction(user_id=test_user.user_id, amount=Decimal("3.00"), reason="earn"))
+    db_session.commit()
+    
+    create_transaction(db_session, test_user.user_id, Decimal("1.00"), "earn")
+    db_session.add(Transaction(user_id=test_user.user_id, amount=Decimal("2.00"), reason="earn"))
+    db_session.commit()
+    create_transaction(db_session, test_user.user_id, Decimal("1.00"), "earn")
+    
+    assert get_user_balance(db_session, test_user.user_id) == Decimal("7.00")
+    assert calculate_balance_from_ledger(db_session, test_user.user_id) == Decimal("7.00")
+
+
+def test_debit_transaction(db_session, test_user):
+    """Test that a debit is applied only when the balance covers it"""
+    create_transaction(db_session, test_user.user_id, Decimal("10.00"), "earn")
+    
+    txn = create_debit_transaction(db_session, test_user.user_id, Decimal("4.00"), "redeem")
+    assert txn is not None
+    assert txn.amount == Decimal("-4.00")
+    assert get_user_balance(db_session, test_user.user_id) == Decimal("6.00")
+    
+    # Insufficient funds leaves both the balance and the ledger untouched
+    assert create_debit_transaction(db_session, test_user.user_id, Decimal("6.01"), "spend") is None
+    assert get_user_balance(db_session, test_user.user_id) == Decimal("6.00")
+    assert calculate_balance_from_ledger(db_session, test_user.user_id) == Decimal("6.00")
+
+
+def test_create_transactions_bulk(db_session, test_user):
+    """Test bulk creation writes every row and updates the running balance"""
+    rows = [
+        {"user_id": test_user.user_id, "amount": Decimal("5.00"), "reason": "earn"},
+        {"user_id": test_user.user_id, "amount": Decimal("2.50"), "reason": "earn", "metadata": {"batch": 1}},
+        {"user_id": test_user.user_id, "amount": Decimal("-1.25"), "reason": "redeem"},
+    ]
+    transactions = create_transactions_bulk(db_session, rows)
+    
+    assert [txn.amount for txn in transactions] == [row["amount"] for row in rows]
+    assert get_user_balance(db_session, test_user.user_id) == Decimal("6.25")
+    assert calculate_balance_from_ledger(db_session, test_user.user_id) == Decimal("6.25")
+
+
 def test_transaction_history(db_session, test_user):
     """Test getting transaction history"""
     # Create multiple transactions
@@ -88,6 +206,48 @@ def test_transaction_history(db_session, test_user):
     assert amounts == sorted(amounts, reverse=True)
 
 
+def test_transaction_page_total(db_session, test_user):
+    """Test that a page reports the full history count, not the page size"""
+    for i in range(5):
+        create_transaction(db_session, test_user.user_id, Decimal("1.00"), "earn")
+    
+    transactions, total = get_transaction_page(db_session, test_user.user_id, limit=2)
+    assert len(transactions) == 2
+    assert total == 5
+    
+    # Paging past the end still reports the total
+    transactions, total = get_transaction_page(db_session, test_user.user_id, limit=2, offset=10)
+    assert transactions == []
+    assert total == 5
+
+
+def test_transaction_keyset_pagination(db_session, test_user):
+    """Test paging through history with a before cursor"""
+    for i in range(5):
+        create_transaction(db_session, test_user.user_id, Decimal(f"{i+1}.00"), "earn")
+    
+    seen = []
+    before = None
+    while True:
+        page, total = get_transaction_page(db_session, test_user.user_id, limit=2, before=before)
+        # Only the first page pays for the full count
+        assert total == (5 if before is None else None)
+        if not page:
+            break
+        seen.extend(page)
+        before = decode_cursor(encode_cursor(page[-1]))
+    
+    assert len(seen) == 5
+    assert len({txn.transaction_id for txn in seen}) == 5
+    assert [txn.amount for txn in seen] == sorted((txn.amount for txn in seen), reverse=True)
+
+
+def test_invalid_cursor():
+    """Test that a malformed cursor is rejected"""
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
 def test_invalid_transaction_reason(db_session, test_user):
     """Test that invalid transaction reason raises error"""
     with pytest.raises(ValueError):
@@ -7,6 +7,7 @@ from src.policy_engine.snap_policy_engine import (
     check_transaction_eligibility,
     PolicyDecision,
 )
+from src.policy_engine.upc_classifier import UPCClassifier
 
 
 def test_eligible_item():
@@ -56,6 +57,16 @@ def test_eligible_pharmacy():
     assert is_eligible is True
 
 
+def test_classify_by_product_name():
+    """Test pattern classification when no category is given"""
+    classifier = UPCClassifier()
+    assert classifier.classify_item(product_name="Craft BEER 6-pack") == "alcohol"
+    assert classifier.classify_item(product_name="Cigar Box") == "tobacco"
+    # Categories are checked in priority order, not by match position
+    assert classifier.classify_item(product_name="Hot Wine Spice") == "alcohol"
+    assert classifier.classify_item(product_name="Fresh Apples") == "unknown"
+
+
 def test_transaction_all_eligible():
     """Test transaction with all eligible items"""
     items = [
@@ -75,3 +75,135 @@ def test_authorize_transaction_no_account(db_session, test_user):
             [],
         )
 
+
+
+def test_memory_idempotency_store():
+    """Test claiming, completing and releasing webhook events"""
+    from src.stripe_integration.idempotency import MemoryIdempotencyStore
+    store = MemoryIdempotencyStore(ttl=60)
+    
+    assert store.begin("evt_1") is True
+    assert store.begin("evt_1") is False
+    assert store.get_response("evt_1") is None  # Still in flight
+    
+    store.complete("evt_1", {"status": "success", "event_id": "evt_1"})
+    assert store.get_response("evt_1") == {"status": "success", "event_id": "evt_1"}
+    
+    # A released claim can be taken again by the retry
+    assert store.begin("evt_2") is True
+    store.release("evt_2")
+    assert store.begin("evt_2") is True
+
+
+@patch('src.stripe_integration.webhooks.WEBHOOK_SECRET', "whsec_test")
+@patch('src.stripe_integration.webhooks.stripe')
+def test_webhook_replay_returns_first_response(mock_stripe, db_session):
+    """Test that a redelivered event is not processed twice"""
+    from src.stripe_integration.webhooks import handle_stripe_webhook
+    payload = b'{"id": "evt_replay_test", "type": "account.updated", "data": {"object": {"id": "acct_test123"}}}'
+    
+    handler = MagicMock()
+    with patch.dict('src.stripe_integration.webhooks._EVENT_HANDLERS', {"account.updated": handler}):
+        first = handle_stripe_webhook(db_session, payload, "sig")
+        second = handle_stripe_webhook(db_session, payload, "sig")
+    
+    assert first == {"status": "success", "event_id": "evt_replay_test"}
+    assert second == first
+    handler.assert_called_once()
+
+
+@patch('src.stripe_integration.webhooks.WEBHOOK_SECRET', "whsec_test")
+@patch('src.stripe_integration.webhooks.stripe')
+def test_webhook_claim_lapses_after_crash(mock_stripe, db_session):
+    """Test that a claim left by a crashed worker is retried, not acked"""
+    import time
+    from fastapi import HTTPException
+    from src.stripe_integration.idempotency import MemoryIdempotencyStore
+    from src.stripe_integration.webhooks import handle_stripe_webhook
+    payload = b'{"id": "evt_crash_test", "type": "account.updated", "data": {"object": {"id": "acct_test123"}}}'
+    store = MemoryIdempotencyStore(ttl=60, pending_ttl=0.05)
+    
+    # The first delivery claimed the event and died before complete/release
+    assert store.begin("evt_crash_test") is True
+    
+    handler = MagicMock()
+    with patch('src.stripe_integration.webhooks.idempotency_store', store), \
+            patch.dict('src.stripe_integration.webhooks._EVENT_HANDLERS', {"account.updated": handler}):
+        with pytest.raises(HTTPException) as exc_info:
+            handle_stripe_webhook(db_session, payload, "sig")
+        assert exc_info.value.status_code == 409
+        handler.assert_not_called()
+        
+        time.sleep(0.1)
+        assert handle_stripe_webhook(db_session, payload, "sig")["status"] == "success"
+    
+    handler.assert_called_once()
+    assert store.begin("evt_crash_test") is False  # Completed claims keep the full TTL
+
+
+def test_process_stripe_event_dedupes_by_stripe_ref(db_session, test_user):
+    """Test that a PaymentIntent already debited by /spend is not written again"""
+    from src.db.models import AuditLog
+    from src.stripe_integration.webhooks import process_stripe_event
+    from src.ledger.transactions import create_transaction, create_debit_transaction, get_user_balance
+    create_transaction(db_session, test_user.user_id, Decimal("10.00"), "earn")
+    create_debit_transaction(db_session, test_user.user_id, Decimal("5.00"), "spend", stripe_ref="pi_dedupe")
+    payment_intent = {
+        "id": "pi_dedupe",
+        "amount": 500,
+        "metadata": {"user_id": str(test_user.user_id)},
+    }
+    for event_id in ["evt_dedupe_1", "evt_dedupe_2"]:
+        process_stripe_event(db_session, {
+            "id": event_id,
+            "type": "payment_intent.succeeded",
+            "data": {"object": payment_intent},
+        })
+    
+    assert get_user_balance(db_session, test_user.user_id) == Decimal("5.00")
+    # Deduped events are still audited
+    assert db_session.query(AuditLog).filter(AuditLog.action == "webhook").count() == 2
+
+
+def test_transfer_created_credits_destination_user(db_session, test_user):
+    """Test that a transfer credits its destination's user once"""
+    from src.db.models import StripeAccount
+    from src.stripe_integration.webhooks import process_stripe_event
+    from src.ledger.transactions import get_transaction_history, get_user_balance
+    db_session.add(StripeAccount(
+        user_id=test_user.user_id,
+        stripe_account_id="acct_transfer",
+        account_type="express",
+    ))
+    db_session.commit()
+    
+    for event_id, transfer_id, destination in [
+        ("evt_transfer_1", "tr_known", "acct_transfer"),
+        ("evt_transfer_2", "tr_known", "acct_transfer"),  # Same transfer, new event
+        ("evt_transfer_3", "tr_unknown", "acct_unknown"),
+    ]:
+        process_stripe_event(db_session, {
+            "id": event_id,
+            "type": "transfer.created",
+            "data": {"object": {"id": transfer_id, "amount": 1000, "destination": destination}},
+        })
+    
+    assert get_user_balance(db_session, test_user.user_id) == Decimal("10.00")
+    assert [t.stripe_ref for t in get_transaction_history(db_session, test_user.user_id)] == ["tr_known"]
+
+
+@patch('src.stripe_integration.webhooks.WEBHOOK_SECRET', "whsec_test")
+def test_webhook_signature_verification(db_session):
+    """Test that signed payloads are accepted and tampered ones rejected"""
+    import hmac
+    import hashlib
+    import time
+    from src.stripe_integration.webhooks import handle_stripe_webhook
+    payload = b'{"id": "evt_signed_test", "type": "account.updated", "data": {"object": {"id": "acct_test123"}}}'
+    timestamp = int(time.time())
+    digest = hmac.new(b"whsec_test", f"{timestamp}.".encode() + payload, hashlib.sha256).hexdigest()
+    signature = f"t={timestamp},v1={digest}"
+    
+    assert handle_stripe_webhook(db_session, payload, signature)["status"] == "success"
+    with pytest.raises(ValueError):
+        handle_stripe_webhook(db_session, payload.replace(b"acct_test123", b"acct_other"), signature)